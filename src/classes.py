@@ -1,4 +1,4 @@
-from typing import List, TypedDict, Set, Dict
+from typing import List, TypedDict, Set, Dict, Tuple, Optional
 
 # --- Core Data Structures (Updated for Parser needs) ---
 
@@ -10,9 +10,66 @@ class Constraint:
 	"""
 	Base interface for all logical rules.
 	"""
+	# Arguments that are categories or keywords, not values: they stay strings
+	LITERALS: Tuple[str, ...] = ()
+
 	def isSatisfied(self, solution: "Solution") -> bool:
 		return True
 
+	def mentions(self) -> Set[str]:
+		"""
+		The entity values this constraint refers to. Values no constraint
+		mentions are interchangeable, see constraints.interchangeable_values.
+		By default every argument except the LITERALS, so a subclass that does
+		not override this never lets symmetry breaking drop its solutions.
+		"""
+		return {arg for name, arg in vars(self).items() if name not in self.LITERALS}
+
+	def key(self) -> tuple:
+		"""
+		The constraint's identity: its type and arguments. Constraints with
+		equal keys are the same rule, see constraints.hashcons.
+		"""
+		return (type(self),) + tuple(vars(self).values())
+
+	def translate(self, symbols: "SymbolTable") -> "Constraint":
+		"""
+		A copy with every string argument, except the LITERALS, replaced by
+		its symbol. Arguments that are no entity get fresh symbols that match
+		nothing, as the string did. Constraints keep their constructor
+		arguments as attributes of the same name.
+		"""
+		return type(self)(**{name: symbols.intern(arg) if isinstance(arg, str) and name not in self.LITERALS else arg
+							 for name, arg in vars(self).items()})
+
+	def __eq__(self, other) -> bool:
+		return isinstance(other, Constraint) and self.key() == other.key()
+
+	def __hash__(self) -> int:
+		return hash(self.key())
+
+
+class SymbolTable:
+	"""
+	Per-puzzle interning of entity values as small ints 0, 1, 2, ... in
+	order of first use.
+	"""
+	def __init__(self):
+		self.ids: Dict[str, int] = {}
+		self.names: List[str] = []
+
+	def intern(self, name: str) -> int:
+		symbol = self.ids.get(name)
+		if symbol is None:
+			symbol = self.ids[name] = len(self.names)
+			self.names.append(name)
+		return symbol
+
+	def name(self, symbol: int) -> str:
+		return self.names[symbol]
+
+	def __len__(self) -> int:
+		return len(self.names)
 
 
 class RawProblem:
@@ -72,12 +129,55 @@ class ParsedProblem:
 		self.requestedEntity = ""
 		self.houseNumber = 0
 
+# Solution.status values
+SOLVED = "solved"
+FAILED = "failed"
+TIMEOUT = "timeout"  # budget ran out, ppl holds the best partial grid
+
+# Solution.grid cell without a value
+EMPTY = -1
+
 class Solution:
-	# List Index = House Number
-	ppl: List[Person] = []
+	# List Index = House Number. A solver result carries the compact grid
+	# instead; ppl is then built from it on first access.
+	ppl: List[Person]
+	# grid[house][c] = index of the house's value in the c-th category of entities
+	grid: Optional[List[List[int]]] = None
 	steps: int
 	ID: str
 	entities: Dict[str, str]
+	status: str = FAILED
+	# Some values were interchangeable: other solutions differ only by swapping them
+	ambiguous: bool = False
+	# Value placements the constraints rejected
+	backtracks: int = 0
+	# Wall-clock time of Solver.solve()
+	seconds: float = 0.0
+
+	def __getattr__(self, name):
+		# Only called while ppl is not set on the instance
+		if name != "ppl":
+			raise AttributeError(name)
+		houses = []
+		if self.grid is not None:
+			columns = list(self.entities.items())
+			houses = [{"properties": {c: values[i] for (c, values), i in zip(columns, row) if i != EMPTY}}
+				for row in self.grid]
+		self.ppl = houses
+		return houses
+
+	def set_grid(self, grid: List[List[int]]):
+		self.grid = grid
+		self.__dict__.pop("ppl", None)
+
+	def rows(self) -> List[List[Optional[str]]]:
+		"""
+		The value of every category per house, in entities order; None where unset.
+		"""
+		if self.grid is None:
+			return [[house["properties"].get(c) for c in self.entities] for house in self.ppl]
+		columns = list(self.entities.values())
+		return [[values[i] if i != EMPTY else None for values, i in zip(columns, row)] for row in self.grid]
 
 
 # --- THE PARSER (Your Part) ---
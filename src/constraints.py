@@ -1,4 +1,10 @@
-from classes import Constraint, Solution
+import weakref
+from typing import Dict, Iterable, List, Set, Tuple
+
+from classes import Constraint, ParsedProblem, Solution, SymbolTable
+from metrics import REGISTRY
+
+CACHE_LOOKUPS = REGISTRY.counter("cache_lookups_total", "Cache lookups by cache and result.", ("cache", "result"))
 
 class ValueConstraint(Constraint):
     """
@@ -9,6 +15,9 @@ class ValueConstraint(Constraint):
         self.subject = subject
         self.value = value
 
+    def mentions(self) -> Set[str]:
+        return {self.subject, self.value}
+
     def isSatisfied(self, solution: Solution) -> bool:
         subject_index = None
         value_index = None
@@ -33,12 +42,17 @@ class ValueConstraint(Constraint):
 
 
 class ImplicationConstraint(Constraint):
+    LITERALS = ("if_key", "then_key")
+
     def __init__(self, if_key: str, if_value: str, then_key: str, then_value: str):
         self.if_key = if_key
         self.if_value = if_value
         self.then_key = then_key
         self.then_value = then_value
 
+    def mentions(self) -> Set[str]:
+        return {self.if_value, self.then_value}
+
     def isSatisfied(self, solution: Solution) -> bool:
         for person in solution.ppl:
             props = person["properties"]
@@ -49,6 +63,8 @@ class ImplicationConstraint(Constraint):
 
 
 class LeftRightConstraint(Constraint):
+    LITERALS = ("key1", "key2", "direction")
+
     def __init__(self, key1: str, value1: str, key2: str, value2: str, direction: str):
         self.key1 = key1
         self.value1 = value1
@@ -56,6 +72,9 @@ class LeftRightConstraint(Constraint):
         self.value2 = value2
         self.direction = direction  # "left" or "right"
 
+    def mentions(self) -> Set[str]:
+        return {self.value1, self.value2}
+
     def isSatisfied(self, solution: Solution) -> bool:
         index1 = None
         index2 = None
@@ -80,10 +99,15 @@ class UniqueConstraint(Constraint):
     """
     Ensures that a specific property value appears exactly once across all persons.
     """
+    LITERALS = ("property_name",)
+
     def __init__(self, property_name: str, value: str):
         self.property_name = property_name
         self.value = value
 
+    def mentions(self) -> Set[str]:
+        return {self.value}
+
     def isSatisfied(self, solution: Solution) -> bool:
         count = 0
 
@@ -104,6 +128,9 @@ class NeighborConstraint(Constraint):
         self.subject = subject
         self.neighbor = neighbor
 
+    def mentions(self) -> Set[str]:
+        return {self.subject, self.neighbor}
+
     def isSatisfied(self, solution: Solution) -> bool:
         index_subject = None
         index_neighbor = None
@@ -131,6 +158,9 @@ class IsNotConstraint(Constraint):
         self.subject = subject
         self.value = value
 
+    def mentions(self) -> Set[str]:
+        return {self.subject, self.value}
+
     def isSatisfied(self, solution: Solution) -> bool:
         for person in solution.ppl:
             props = person.get("properties", {})
@@ -151,6 +181,9 @@ class BetweenConstraint(Constraint):
         self.value1 = value1
         self.value2 = value2
 
+    def mentions(self) -> Set[str]:
+        return {self.subject, self.value1, self.value2}
+
     def isSatisfied(self, solution: Solution) -> bool:
         index_subject = None
         index_val1 = None
@@ -187,6 +220,9 @@ class OrConstraint(Constraint):
         self.option1 = option1
         self.option2 = option2
 
+    def mentions(self) -> Set[str]:
+        return {self.option1, self.option2}
+
     def isSatisfied(self, solution: Solution) -> bool:
         option1_found = False
         option2_found = False
@@ -210,3 +246,68 @@ class OrConstraint(Constraint):
         return f"OrConstraint: [{self.option1}] OR [{self.option2}]"
 
 
+def interchangeable_values(entities: Dict[str, List[str]], constraints: List[Constraint]) -> Dict[str, List[str]]:
+    """
+    Values of a category that no constraint mentions can be swapped in any
+    solution without breaking it. Returns category -> those values (only
+    classes of two or more), in domain order.
+    """
+    mentioned = set()
+    for constraint in constraints:
+        mentioned |= constraint.mentions()
+
+    classes = {}
+    for category, values in entities.items():
+        free = [v for v in values if v not in mentioned]
+        if len(free) > 1:
+            classes[category] = free
+    return classes
+
+
+# Canonical instance per constraint key. Weak, so constraints no parsed
+# problem holds any more are dropped.
+_consed: "weakref.WeakValueDictionary" = weakref.WeakValueDictionary()
+
+
+def hashcons(constraint: Constraint) -> Constraint:
+    """
+    The shared instance equal to constraint. The same clue in any number of
+    parsed problems is one object; constraints must not be mutated.
+    """
+    return _consed.setdefault(constraint.key(), constraint)
+
+
+def unique_constraints(constraints: Iterable[Constraint]) -> List[Constraint]:
+    """
+    Hash-consed constraints without duplicates, in first-seen order. Only
+    for string-level constraints, as parsed.
+    """
+    unique, lookups, hits = {}, 0, 0
+    for constraint in constraints:
+        canonical = hashcons(constraint)
+        lookups += 1
+        hits += canonical is not constraint
+        unique.setdefault(canonical, None)
+
+    if lookups:
+        CACHE_LOOKUPS.inc(hits, cache="constraint", result="hit")
+        CACHE_LOOKUPS.inc(lookups - hits, cache="constraint", result="miss")
+    return list(unique)
+
+
+def intern_problem(problem: ParsedProblem) -> Tuple[ParsedProblem, SymbolTable]:
+    """
+    A copy of problem whose values (in the entities and as constraint
+    arguments) are symbols of a fresh SymbolTable, so the search compares
+    small ints. Categories stay strings, they are the keys of every house.
+    """
+    symbols = SymbolTable()
+    interned = ParsedProblem(problem.ID, *problem.size)
+    interned.requestedEntity = problem.requestedEntity
+    interned.houseNumber = problem.houseNumber
+    interned.entities = {category: [symbols.intern(v) for v in values]
+                         for category, values in problem.entities.items()}
+    # Symbols are only meaningful within this table, so the translated
+    # constraints are deduplicated here and never hash-consed globally
+    interned.constraints = list(dict.fromkeys(c.translate(symbols) for c in problem.constraints))
+    return interned, symbols
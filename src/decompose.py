@@ -0,0 +1,173 @@
+import time
+import unittest
+from concurrent.futures import Executor
+from typing import Dict, List, Optional
+
+from classes import ParsedProblem, Solution, SOLVED, FAILED, TIMEOUT, EMPTY
+from constraints import Constraint, ValueConstraint, LeftRightConstraint
+from metrics import REGISTRY, Registry
+from solver import Solver
+
+
+def components(problem: ParsedProblem) -> List[ParsedProblem]:
+    """
+    Splits a problem into sub-problems whose categories share no constraint.
+
+    Categories are nodes; a constraint connects the categories of all values
+    it mentions. Apart from every category being a permutation of the same
+    houses (which holds in each sub-problem on its own), components do not
+    interact, so their solutions combine freely. Constraints mentioning no
+    entity value can never fail and are dropped.
+    """
+    categories_of: Dict[str, List[str]] = {}
+    for category, values in problem.entities.items():
+        for value in values:
+            categories_of.setdefault(value, []).append(category)
+
+    parent = {category: category for category in problem.entities}
+
+    def find(c):
+        while parent[c] != c:
+            parent[c] = parent[parent[c]]
+            c = parent[c]
+        return c
+
+    touched = []
+    for constraint in problem.constraints:
+        cats = [c for value in constraint.mentions() for c in categories_of.get(value, [])]
+        for c in cats[1:]:
+            parent[find(c)] = find(cats[0])
+        touched.append(cats)
+
+    groups: Dict[str, ParsedProblem] = {}
+    for category, values in problem.entities.items():
+        root = find(category)
+        if root not in groups:
+            groups[root] = ParsedProblem(problem.ID, *problem.size)
+        groups[root].entities[category] = values
+
+    for constraint, cats in zip(problem.constraints, touched):
+        if cats:
+            groups[find(cats[0])].constraints.append(constraint)
+
+    return list(groups.values())
+
+
+def _solve_component(sub: ParsedProblem, max_nodes: Optional[int], time_limit: Optional[float]) -> Solution:
+    # The DecomposingSolver reports the whole puzzle, not its components
+    return Solver(max_nodes=max_nodes, time_limit=time_limit, metrics=None).solve(sub)
+
+
+class DecomposingSolver(Solver):
+    """
+    Solver that solves the independent components of a problem one by one
+    (or in parallel on `executor`) and merges their grids, so the search
+    space is the sum of the components' instead of their product.
+    """
+
+    def __init__(self, max_nodes: int = None, time_limit: float = None, executor: Optional[Executor] = None,
+                 metrics: Registry = REGISTRY):
+        super().__init__(max_nodes, time_limit, metrics)
+        self.executor = executor
+
+    def _solve(self, problem: ParsedProblem) -> Solution:
+        parts = components(problem)
+        if len(parts) <= 1:
+            return super()._solve(problem)
+
+        if self.executor is not None:
+            futures = [self.executor.submit(_solve_component, sub, self.max_nodes, self.time_limit) for sub in parts]
+            results = [f.result() for f in futures]
+        else:
+            results = self._solve_sequentially(parts)
+
+        # Components hold the same category value lists, so their grid columns copy over as they are
+        solution = self._new_solution(problem)
+        column = {category: c for c, category in enumerate(problem.entities)}
+        grid = [[EMPTY] * len(column) for _ in solution.ppl]
+        for part in results:
+            columns = [column[category] for category in part.entities]
+            for row, part_row in zip(grid, part.grid):
+                for c, i in zip(columns, part_row):
+                    row[c] = i
+        solution.set_grid(grid)
+        solution.steps = sum(part.steps for part in results)
+        self.backtracks = sum(part.backtracks for part in results)
+        solution.ambiguous = any(part.ambiguous for part in results)
+
+        statuses = {part.status for part in results}
+        solution.status = FAILED if FAILED in statuses else TIMEOUT if TIMEOUT in statuses else SOLVED
+        return solution
+
+    def _solve_sequentially(self, parts: List[ParsedProblem]) -> List[Solution]:
+        # The budgets cover the whole problem, each component gets what is left
+        deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        results = []
+        for sub in parts:
+            nodes = None if self.max_nodes is None else max(0, self.max_nodes - sum(r.steps for r in results))
+            seconds = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            part = _solve_component(sub, nodes, seconds)
+            results.append(part)
+            if part.status == FAILED:
+                break  # no combined solution exists
+        return results
+
+    def count_solutions(self, problem: ParsedProblem, limit: int = 2) -> int:
+        """
+        The product of the components' counts, capped at limit.
+        """
+        parts = components(problem)
+        if len(parts) <= 1:
+            return super().count_solutions(problem, limit)
+
+        # One budget for the whole problem, as in _solve_sequentially
+        deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        count, steps, self.status = 1, 0, SOLVED
+        for sub in parts:
+            nodes = None if self.max_nodes is None else max(0, self.max_nodes - steps)
+            seconds = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            solver = Solver(nodes, seconds, metrics=None)
+            count *= solver.count_solutions(sub, limit)
+            steps += solver.steps
+            if solver.status == TIMEOUT:
+                self.status = TIMEOUT
+                break  # nothing left for the other components
+            if count == 0:
+                break
+
+        self.steps = steps
+        return min(count, limit)
+
+
+class DecomposeTest(unittest.TestCase):
+    def _problem(self):
+        problem = ParsedProblem("test", 3, 4)
+        problem.entities = {
+            "name": ["alice", "bob", "carol"], "color": ["red", "blue", "green"],
+            "pet": ["cat", "dog", "fish"], "drink": ["tea", "milk", "water"],
+        }
+        problem.constraints = [
+            ValueConstraint("alice", "red"), LeftRightConstraint("name", "bob", "color", "red", "left"),
+            ValueConstraint("cat", "milk"), LeftRightConstraint("pet", "fish", "drink", "milk", "right"),
+            Constraint(),
+        ]
+        return problem
+
+    def testComponents(self):
+        parts = components(self._problem())
+        self.assertEqual(sorted(sorted(p.entities) for p in parts), [["color", "name"], ["drink", "pet"]])
+        self.assertEqual(sorted(len(p.constraints) for p in parts), [2, 2])
+
+    def testMatchesPlainSolver(self):
+        problem = self._problem()
+        solution = DecomposingSolver().solve(problem)
+        self.assertEqual(solution.status, SOLVED)
+        self.assertTrue(all(c.isSatisfied(solution) for c in problem.constraints))
+        self.assertTrue(all(len(h["properties"]) == 4 for h in solution.ppl))
+        self.assertEqual(DecomposingSolver().count_solutions(problem, 100), Solver().count_solutions(problem, 100))
+
+        # The node budget is shared by the components, not given to each
+        solver = DecomposingSolver(max_nodes=40)
+        solver.count_solutions(problem, 100)
+        self.assertEqual(solver.status, TIMEOUT)
+        self.assertLessEqual(solver.steps, 41)
@@ -0,0 +1,177 @@
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+import unittest
+from typing import Callable, Dict, List
+
+from classes import RawProblem
+from parser import Parser, iter_clues
+from source import PuzzleSource
+
+# Golden corpus: a fixed sample of Gridmode and mc puzzles together with the
+# serialised output of every parser implementation. A parser change that
+# alters any constraint set shows up as a mismatch in GoldenTest and in
+# `python golden.py bench`; intended changes are recorded with
+# `python golden.py build`.
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+VIBE4_DIR = os.path.join(SRC_DIR, "..", "vibe4")
+GOLDEN_FILE = os.path.join(SRC_DIR, "golden_corpus.json")
+
+# (file, take every n-th row, number of puzzles)
+SAMPLES = [
+    (os.path.join(SRC_DIR, "..", "Gridmode-00000-of-00001.parquet"), 33, 30),
+    (os.path.join(SRC_DIR, "..", "mc-00000-of-00001.parquet"), 108, 30),
+]
+
+
+def _src_parser() -> Callable[[RawProblem], dict]:
+    parser = Parser()
+
+    def parse(raw: RawProblem) -> dict:
+        if raw.question:
+            parsed = parser.parseMultipleChoice(raw)
+            extra = {"requestedEntity": getattr(parsed, "requestedEntity", None),
+                     "houseNumber": getattr(parsed, "houseNumber", None)}
+        else:
+            parsed = parser.parseGridmode(raw)
+            extra = {}
+        return dict(size=list(parsed.size), entities=parsed.entities,
+                    constraints=[[type(c).__name__, vars(c)] for c in parsed.constraints], **extra)
+    return parse
+
+
+def _vibe4_parser() -> Callable[[RawProblem], dict]:
+    # vibe4 modules share names with ours (parser, solver), load it under a private name
+    if VIBE4_DIR not in sys.path:
+        sys.path.append(VIBE4_DIR)
+    spec = importlib.util.spec_from_file_location("vibe4_parser", os.path.join(VIBE4_DIR, "parser.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    def parse(raw: RawProblem) -> dict:
+        size = raw.size
+        if not size:
+            # mc rows have no size column, the vibe4 parser only needs the house count
+            match = re.search(r"There are (\d+) houses", raw.text)
+            size = f"{match.group(1)}*0" if match else ""
+        parser = module.PuzzleParser({"id": raw.ID, "puzzle": raw.text, "size": size})
+        parser.parse()
+        return dict(houses=parser.num_houses, groups=parser.groups,
+                    records=[list(r) for r in parser.records])
+    return parse
+
+
+PARSERS: Dict[str, Callable[[], Callable[[RawProblem], dict]]] = {
+    "src": _src_parser,
+    "vibe4": _vibe4_parser,
+}
+
+
+def _to_raw(puzzle: dict) -> RawProblem:
+    return RawProblem(puzzle["id"], puzzle["text"], size=puzzle.get("size", ""),
+                      question=puzzle.get("question", ""), choiches=puzzle.get("choices", []))
+
+
+def _normalise(output: dict) -> dict:
+    # Tuples and lists compare the same after a JSON round trip
+    return json.loads(json.dumps(output))
+
+
+def run_parser(name: str, puzzles: List[dict]) -> Dict[str, dict]:
+    parse = PARSERS[name]()
+    return {p["id"]: _normalise(parse(_to_raw(p))) for p in puzzles}
+
+
+def build_corpus(path: str = GOLDEN_FILE) -> dict:
+    """
+    Samples the puzzles listed in SAMPLES and records every parser's output.
+    """
+    puzzles = []
+    for file, stride, count in SAMPLES:
+        for i, raw in enumerate(PuzzleSource(file, limit=stride * count)):
+            if i % stride == 0:
+                puzzles.append({"id": raw.ID, "text": raw.text, "size": raw.size,
+                                "question": raw.question, "choices": [str(c) for c in raw.choiches]})
+
+    corpus = {"puzzles": puzzles, "outputs": {name: run_parser(name, puzzles) for name in PARSERS}}
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(_dumps(corpus))
+    return corpus
+
+
+def _dumps(corpus: dict) -> str:
+    # One puzzle / one parser output per line keeps diffs of the corpus readable
+    line = lambda value: json.dumps(value, sort_keys=True, separators=(",", ":"))
+    puzzles = ",\n".join("  " + line(p) for p in corpus["puzzles"])
+    outputs = ",\n".join(
+        f" {json.dumps(name)}: {{\n" + ",\n".join(f"  {json.dumps(pid)}: {line(out)}" for pid, out in outs.items()) + "\n }"
+        for name, outs in corpus["outputs"].items())
+    return f'{{"puzzles": [\n{puzzles}\n],\n"outputs": {{\n{outputs}\n}}}}\n'
+
+
+def load_corpus(path: str = GOLDEN_FILE) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def mismatches(name: str, corpus: dict) -> List[str]:
+    """
+    Ids of the corpus puzzles whose output differs from the golden one.
+    """
+    expected = corpus["outputs"][name]
+    actual = run_parser(name, corpus["puzzles"])
+    return [pid for pid in expected if actual.get(pid) != expected[pid]]
+
+
+def benchmark(name: str, corpus: dict, repeat: int = 5) -> dict:
+    """
+    Best-of-`repeat` throughput of one parser over the corpus puzzles.
+    """
+    puzzles = [_to_raw(p) for p in corpus["puzzles"]]
+    clues = sum(1 for raw in puzzles for _ in iter_clues(raw.text))
+    parse = PARSERS[name]()
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for raw in puzzles:
+            parse(raw)
+        best = min(best, time.perf_counter() - start)
+
+    return {"puzzles_per_s": len(puzzles) / best, "clues_per_s": clues / best, "seconds": best}
+
+
+class GoldenTest(unittest.TestCase):
+    def testParsersMatchCorpus(self):
+        corpus = load_corpus()
+        for name in PARSERS:
+            with self.subTest(parser=name):
+                self.assertEqual(mismatches(name, corpus), [])
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    argParse = ArgumentParser(description="Golden parser corpus and parser benchmark")
+    argParse.add_argument("command", choices=["bench", "build"])
+    argParse.add_argument("-r", "--repeat", type=int, default=5, dest="repeat")
+    args = argParse.parse_args()
+
+    if args.command == "build":
+        corpus = build_corpus()
+        print(f"Recorded {len(corpus['puzzles'])} puzzles for {', '.join(PARSERS)} in {GOLDEN_FILE}")
+        sys.exit(0)
+
+    corpus = load_corpus()
+    failed = False
+    for name in PARSERS:
+        stats = benchmark(name, corpus, args.repeat)
+        diff = mismatches(name, corpus)
+        failed |= bool(diff)
+        print(f"{name:6s} {stats['puzzles_per_s']:9.1f} puzzles/s {stats['clues_per_s']:10.1f} clues/s | "
+              + (f"{len(diff)} mismatches: {', '.join(diff[:5])}" if diff else "matches golden corpus"))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,211 @@
+import random
+import unittest
+from typing import List, Sequence
+
+import numpy as np
+
+from classes import ParsedProblem, Solution
+from constraints import *
+
+# A complete grid is an int8 array of shape (houses, attributes): cell [h, c]
+# is the index of the value of category c (in ParsedProblem.entities order)
+# in house h, -1 if empty. Constraints compile to int records
+#   (kind, c1, v1, c2, v2, c3, v3)
+# that are evaluated for many grids at once with NumPy.
+
+EMPTY = -1
+RECORD_WIDTH = 7
+
+VALUE, IMPLIES, LEFT, RIGHT, UNIQUE, NEIGHBOR, IS_NOT, BETWEEN, ALWAYS = range(9)
+
+
+def value_table(problem: ParsedProblem) -> dict:
+    """
+    value -> (category index, value index), first category wins like the
+    `x in props.values()` lookups of the constraint classes.
+    """
+    table = {}
+    for c, values in enumerate(problem.entities.values()):
+        for v, value in enumerate(values):
+            table.setdefault(value, (c, v))
+    return table
+
+
+def compile_constraints(problem: ParsedProblem) -> np.ndarray:
+    """
+    Compiles problem.constraints to (n, RECORD_WIDTH) records. Values that are
+    not entities (e.g. house ordinals) compile to -1 and, as in isSatisfied,
+    can never violate a constraint.
+    """
+    table = value_table(problem)
+    categories = {name: c for c, name in enumerate(problem.entities)}
+
+    def ref(value):
+        return table.get(value, (EMPTY, EMPTY))
+
+    def keyed(key, value):
+        c = categories.get(key, EMPTY)
+        values = problem.entities.get(key, [])
+        return c, values.index(value) if value in values else EMPTY
+
+    records = []
+    for con in problem.constraints:
+        if isinstance(con, ValueConstraint):
+            records.append((VALUE, *ref(con.subject), *ref(con.value), EMPTY, EMPTY))
+        elif isinstance(con, ImplicationConstraint):
+            records.append((IMPLIES, *keyed(con.if_key, con.if_value), *keyed(con.then_key, con.then_value), EMPTY, EMPTY))
+        elif isinstance(con, LeftRightConstraint):
+            kind = LEFT if con.direction == "left" else RIGHT
+            records.append((kind, *keyed(con.key1, con.value1), *keyed(con.key2, con.value2), EMPTY, EMPTY))
+        elif isinstance(con, UniqueConstraint):
+            records.append((UNIQUE, *keyed(con.property_name, con.value), EMPTY, EMPTY, EMPTY, EMPTY))
+        elif isinstance(con, NeighborConstraint):
+            records.append((NEIGHBOR, *ref(con.subject), *ref(con.neighbor), EMPTY, EMPTY))
+        elif isinstance(con, IsNotConstraint):
+            records.append((IS_NOT, *ref(con.subject), *ref(con.value), EMPTY, EMPTY))
+        elif isinstance(con, BetweenConstraint):
+            records.append((BETWEEN, *ref(con.subject), *ref(con.value1), *ref(con.value2)))
+        else:
+            # OrConstraint and the base Constraint are always satisfied
+            records.append((ALWAYS, EMPTY, EMPTY, EMPTY, EMPTY, EMPTY, EMPTY))
+
+    return np.asarray(records, dtype=np.int16).reshape(-1, RECORD_WIDTH)
+
+
+def encode_solution(problem: ParsedProblem, solution: Solution) -> np.ndarray:
+    if solution.grid is not None and solution.entities is problem.entities:
+        return np.asarray(solution.grid, dtype=np.int8).reshape(-1, len(problem.entities))
+    grid = np.full((len(solution.ppl), len(problem.entities)), EMPTY, dtype=np.int8)
+    for c, (category, values) in enumerate(problem.entities.items()):
+        for h, house in enumerate(solution.ppl):
+            value = house["properties"].get(category)
+            if value in values:
+                grid[h, c] = values.index(value)
+    return grid
+
+
+def encode_rows(problem: ParsedProblem, header: Sequence[str], rows: Sequence[Sequence[str]]) -> np.ndarray:
+    """
+    Encodes a dataset `solution` struct. The dataset's column names ("Name",
+    "Color") differ from the parsed categories, so columns are matched to the
+    category that contains their values (case-insensitive).
+    """
+    grid = np.full((len(rows), len(problem.entities)), EMPTY, dtype=np.int8)
+    lowered = [[v.lower() for v in values] for values in problem.entities.values()]
+
+    for col in range(len(header)):
+        cells = [str(row[col]).lower() for row in rows]
+        for c, values in enumerate(lowered):
+            if all(cell in values for cell in cells):
+                grid[:, c] = [values.index(cell) for cell in cells]
+                break
+    return grid
+
+
+def evaluate(grids: np.ndarray, owner: np.ndarray, records: np.ndarray) -> np.ndarray:
+    """
+    Evaluates every record against the grid it belongs to.
+    grids: (B, H, A) int8, owner: (R,) grid index of each record, records: (R, 7)
+    Returns a (R,) bool array, True where the constraint holds.
+    """
+    owner = np.asarray(owner, dtype=np.intp)
+    records = np.asarray(records, dtype=np.intp)
+    kind = records[:, 0]
+    houses = np.arange(grids.shape[1])
+
+    def match(c, v):
+        # (R, H): which house of the owner's grid holds value v of category c
+        valid = (c >= 0) & (v >= 0)
+        cells = grids[owner, :, np.where(valid, c, 0)]
+        return (cells == v[:, None]) & valid[:, None]
+
+    m1 = match(records[:, 1], records[:, 2])
+    m2 = match(records[:, 3], records[:, 4])
+    m3 = match(records[:, 5], records[:, 6])
+    f1, f2, f3 = m1.any(axis=1), m2.any(axis=1), m3.any(axis=1)
+    p1, p2, p3 = (np.where(m, houses, -1).max(axis=1) for m in (m1, m2, m3))
+    both = f1 & f2
+
+    ok = np.ones(len(records), dtype=bool)
+    ok = np.where(kind == VALUE, ~both | (p1 == p2), ok)
+    ok = np.where(kind == IMPLIES, ~(m1 & ~m2).any(axis=1), ok)
+    ok = np.where(kind == LEFT, ~both | (p1 == p2 - 1), ok)
+    ok = np.where(kind == RIGHT, ~both | (p1 == p2 + 1), ok)
+    ok = np.where(kind == UNIQUE, m1.sum(axis=1) <= 1, ok)
+    ok = np.where(kind == NEIGHBOR, ~both | (np.abs(p1 - p2) == 1), ok)
+    ok = np.where(kind == IS_NOT, ~(m1 & m2).any(axis=1), ok)
+    between = (np.minimum(p2, p3) < p1) & (p1 < np.maximum(p2, p3))
+    ok = np.where(kind == BETWEEN, ~(both & f3) | between, ok)
+    return ok
+
+
+def check_grids(problem: ParsedProblem, grids: np.ndarray) -> np.ndarray:
+    """
+    Checks many candidate grids (B, H, A) of one problem. Returns (B,) bool.
+    """
+    records = compile_constraints(problem)
+    batch = len(grids)
+    owner = np.repeat(np.arange(batch), len(records))
+    ok = evaluate(grids, owner, np.tile(records, (batch, 1)))
+    return ok.reshape(batch, len(records)).all(axis=1)
+
+
+def check_problems(problems: List[ParsedProblem], grids: List[np.ndarray]) -> np.ndarray:
+    """
+    Checks grids[i] against problems[i] for a whole dataset in one evaluation.
+    Grids of different sizes are padded with empty houses/attributes.
+    """
+    houses = max((g.shape[0] for g in grids), default=0)
+    attrs = max((g.shape[1] for g in grids), default=0)
+    packed = np.full((len(grids), houses, attrs), EMPTY, dtype=np.int8)
+    for i, g in enumerate(grids):
+        packed[i, :g.shape[0], :g.shape[1]] = g
+
+    compiled = [compile_constraints(p) for p in problems]
+    owner = np.repeat(np.arange(len(compiled)), [len(r) for r in compiled])
+    records = np.concatenate(compiled) if compiled else np.zeros((0, RECORD_WIDTH), dtype=np.int16)
+
+    result = np.ones(len(grids), dtype=bool)
+    np.logical_and.at(result, owner, evaluate(packed, owner, records))
+    return result
+
+
+class GridCheckTest(unittest.TestCase):
+    def testMatchesIsSatisfied(self):
+        problem = ParsedProblem("test", 4, 3)
+        problem.entities = {
+            "name": ["alice", "bob", "carol", "dave"],
+            "color": ["red", "blue", "green", "white"],
+            "pet": ["cat", "dog", "fish", "bird"],
+        }
+        problem.constraints = [
+            ValueConstraint("alice", "red"), NeighborConstraint("bob", "dog"),
+            LeftRightConstraint("color", "blue", "pet", "fish", "left"),
+            LeftRightConstraint("name", "carol", "color", "white", "right"),
+            IsNotConstraint("dave", "cat"), BetweenConstraint("green", "alice", "bird"),
+            ImplicationConstraint("pet", "cat", "color", "green"), UniqueConstraint("name", "bob"),
+            OrConstraint("red", "dog"), ValueConstraint("1", "alice"),
+        ]
+
+        rng = random.Random(7)
+        solutions, grids = [], []
+        for _ in range(200):
+            solution = Solution()
+            solution.ppl = [{"properties": {}} for _ in range(4)]
+            for category, values in problem.entities.items():
+                for house, value in zip(solution.ppl, rng.sample(values, 4)):
+                    house["properties"][category] = value
+            solutions.append(solution)
+            grids.append(encode_solution(problem, solution))
+
+        # Per constraint
+        records = compile_constraints(problem)
+        owner = np.repeat(np.arange(len(grids)), len(records))
+        ok = evaluate(np.stack(grids), owner, np.tile(records, (len(grids), 1)))
+        expected = [[c.isSatisfied(s) for c in problem.constraints] for s in solutions]
+        self.assertEqual(ok.reshape(len(grids), -1).tolist(), expected)
+
+        # Per grid, both entry points
+        expected = [all(row) for row in expected]
+        self.assertEqual(list(check_grids(problem, np.stack(grids))), expected)
+        self.assertEqual(list(check_problems([problem] * len(grids), grids)), expected)
@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from argparse import ArgumentParser
+from typing import List
+
+from source import PuzzleSource
+from service import DEFAULT_PORT
+
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    Nearest-rank percentile, p in [0, 100].
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(p / 100 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def run_load(url: str, requests: List[dict], concurrency: int = 4, batch: int = 1) -> dict:
+    """
+    Sends the requests from `concurrency` client threads, `batch` puzzles per
+    HTTP call, and returns latency percentiles (ms, per call) and throughput.
+    """
+    calls = [requests[i:i + batch] for i in range(0, len(requests), batch)]
+    latencies, errors = [], []
+    solved = 0  # puzzles in the successful calls; the last call may be short
+    lock = threading.Lock()
+    next_call = iter(range(len(calls)))
+
+    def client():
+        nonlocal solved
+        while True:
+            with lock:
+                i = next(next_call, None)
+            if i is None:
+                return
+
+            payload = calls[i] if batch > 1 else calls[i][0]
+            req = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req) as resp:
+                    resp.read()
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed * 1000)
+                    solved += len(calls[i])
+            except urllib.error.URLError as e:
+                with lock:
+                    errors.append(str(e))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    return {
+        "calls": len(latencies), "errors": len(errors),
+        "p50_ms": percentile(latencies, 50), "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies, default=0.0),
+        "puzzles_per_s": solved / wall if wall else 0.0,
+    }
+
+
+def main():
+    argParse = ArgumentParser(description="Load generator for service.py")
+    argParse.add_argument("-f", "--file", type=str, required=True, dest="file", help="Puzzle file (Parquet, JSON or CSV).")
+    argParse.add_argument("-n", "--limit", type=int, default=200, dest="limit")
+    argParse.add_argument("-c", "--concurrency", type=int, default=4, dest="concurrency")
+    argParse.add_argument("-b", "--batch", type=int, default=1, dest="batch", help="Puzzles per HTTP request.")
+    argParse.add_argument("--url", type=str, default=f"http://127.0.0.1:{DEFAULT_PORT}/solve", dest="url")
+    args = argParse.parse_args()
+
+    requests = list(PuzzleSource(args.file, limit=args.limit or None).rows())
+    stats = run_load(args.url, requests, args.concurrency, args.batch)
+
+    print(f"{stats['calls']} calls ({stats['errors']} errors), {args.concurrency} clients, batch {args.batch}")
+    print(f"p50 {stats['p50_ms']:.1f} ms | p99 {stats['p99_ms']:.1f} ms | max {stats['max_ms']:.1f} ms")
+    print(f"throughput {stats['puzzles_per_s']:.1f} puzzles/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import io
+import json
+import logging
+import os
+import sys
+import unittest
+from typing import Optional, TextIO
+
+# Leveled logging for the parser, solvers and runners, on top of the logging
+# module. Messages use %-style arguments, so nothing is formatted unless the
+# level is enabled; hot paths that would build extra data guard it with
+# log.isEnabledFor(...). The default level (WARNING, or $ZEBRA_LOG_LEVEL)
+# keeps per-puzzle messages silent.
+
+ROOT = "zebra"
+LEVEL_ENV = "ZEBRA_LOG_LEVEL"
+DEFAULT_LEVEL = "WARNING"
+
+# Attributes every LogRecord has; everything else came in through extra=
+_STANDARD = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT}.{name}")
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: time, level, logger, message and the
+    fields passed with extra={...}.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"time": record.created, "level": record.levelname, "logger": record.name,
+                 "message": record.getMessage()}
+        entry.update((k, v) for k, v in vars(record).items() if k not in _STANDARD)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure(level: Optional[str] = None, json_path: Optional[str] = None, stream: Optional[TextIO] = None):
+    """
+    Sets the level of all zebra loggers, logs readable lines to stream
+    (default stderr) and, with json_path, JSON lines to that file as well.
+    """
+    root = logging.getLogger(ROOT)
+    root.setLevel((level or os.environ.get(LEVEL_ENV, DEFAULT_LEVEL)).upper())
+    root.propagate = False
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+    console = logging.StreamHandler(stream or sys.stderr)
+    console.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+    root.addHandler(console)
+
+    if json_path:
+        sink = logging.FileHandler(json_path, encoding="utf-8")
+        sink.setFormatter(JsonFormatter())
+        root.addHandler(sink)
+
+
+# Before configure() only the level applies; warnings go to stderr
+logging.getLogger(ROOT).setLevel(os.environ.get(LEVEL_ENV, DEFAULT_LEVEL).upper())
+
+
+class LogsTest(unittest.TestCase):
+    def tearDown(self):
+        configure(DEFAULT_LEVEL)
+
+    def testLazyAndJson(self):
+        class Expensive:
+            formatted = 0
+
+            def __str__(self):
+                Expensive.formatted += 1
+                return "expensive"
+
+        stream = io.StringIO()
+        configure("WARNING", stream=stream)
+        log = get_logger("test")
+        log.debug("skipped %s", Expensive())
+        self.assertEqual(Expensive.formatted, 0)
+        self.assertEqual(stream.getvalue(), "")
+
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "log.jsonl")
+            configure("DEBUG", json_path=path, stream=stream)
+            log.debug("parsed %s", Expensive(), extra={"puzzle": "p1"})
+            configure(DEFAULT_LEVEL)
+            with open(path, encoding="utf-8") as f:
+                entry = json.loads(f.readline())
+
+        self.assertEqual((entry["level"], entry["message"], entry["puzzle"]), ("DEBUG", "parsed expensive", "p1"))
+        self.assertIn("DEBUG zebra.test: parsed expensive", stream.getvalue())
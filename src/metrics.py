@@ -0,0 +1,223 @@
+import bisect
+import json
+import threading
+import unittest
+from typing import Dict, List, Sequence, Tuple
+
+# Process-local metrics registry. Instrumented code keeps its per-puzzle
+# numbers in plain locals and publishes them once per parse / solve, so the
+# search loops never touch the registry. Worker processes send their numbers
+# to the parent with drain() -> merge().
+
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+NODE_BUCKETS = (10, 30, 100, 300, 1000, 3000, 10000, 30000, 100000, 300000)
+
+
+class _Metric:
+    def __init__(self, registry: "Registry", name: str, help: str, labels: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+
+class Counter(_Metric):
+    type = COUNTER
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def _merge(self, key, value):
+        self.values[key] = self.values.get(key, 0) + value
+
+
+class Histogram(_Metric):
+    """
+    Cumulative buckets as in Prometheus; values holds [counts per bucket
+    (last = +Inf), sum, count] per label set.
+    """
+    type = HISTOGRAM
+
+    def __init__(self, registry, name, help, labels, buckets: Sequence[float]):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        entry = self.values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def _merge(self, key, value):
+        entry = self.values.get(key)
+        if entry is None:
+            self.values[key] = [list(value[0]), value[1], value[2]]
+            return
+        entry[0] = [a + b for a, b in zip(entry[0], value[0])]
+        entry[1] += value[1]
+        entry[2] += value[2]
+
+
+class Registry:
+    def __init__(self, prefix: str = "zebra_"):
+        self.prefix = prefix
+        self.lock = threading.RLock()
+        self.metrics: Dict[str, _Metric] = {}
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help, labels, buckets))
+
+    def _register(self, metric):
+        # Modules may be imported twice (e.g. under another name), keep the first
+        return self.metrics.setdefault(metric.name, metric)
+
+    def snapshot(self) -> dict:
+        """
+        All values as plain JSON data, the format of to_json() and merge().
+        """
+        with self.lock:
+            return {name: {"type": m.type, "help": m.help, "labels": list(m.label_names),
+                           "buckets": list(getattr(m, "buckets", [])),
+                           "values": [[list(key), _copy(value)] for key, value in m.values.items()]}
+                    for name, m in self.metrics.items()}
+
+    def reset(self):
+        with self.lock:
+            for metric in self.metrics.values():
+                metric.values.clear()
+
+    def drain(self) -> dict:
+        """
+        snapshot() and reset() in one step, for worker processes.
+        """
+        with self.lock:
+            snap = self.snapshot()
+            self.reset()
+            return snap
+
+    def merge(self, snapshot: dict):
+        with self.lock:
+            for name, data in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    if data["type"] == COUNTER:
+                        metric = self.counter(name, data["help"], data["labels"])
+                    else:
+                        metric = self.histogram(name, data["help"], data["labels"], data["buckets"])
+                for key, value in data["values"]:
+                    metric._merge(tuple(key), value)
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=1, sort_keys=True)
+
+    def to_prometheus(self) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        with self.lock:
+            for name, metric in sorted(self.metrics.items()):
+                full = self.prefix + name
+                lines.append(f"# HELP {full} {metric.help}")
+                lines.append(f"# TYPE {full} {metric.type}")
+                for key, value in sorted(metric.values.items()):
+                    labels = list(zip(metric.label_names, key))
+                    if metric.type == COUNTER:
+                        lines.append(f"{full}{_labels(labels)} {_number(value)}")
+                        continue
+                    counts, total, count = value
+                    cumulative = 0
+                    for bound, n in zip(list(metric.buckets) + ["+Inf"], counts):
+                        cumulative += n
+                        le = bound if bound == "+Inf" else _number(bound)
+                        lines.append(f"{full}_bucket{_labels(labels + [('le', le)])} {cumulative}")
+                    lines.append(f"{full}_sum{_labels(labels)} {_number(total)}")
+                    lines.append(f"{full}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """
+        Writes a JSON snapshot (*.json) or a Prometheus text file (anything else).
+        """
+        text = self.to_json() if path.endswith(".json") else self.to_prometheus()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def _copy(value):
+    # Histogram entries are mutable lists
+    return [list(value[0]), value[1], value[2]] if isinstance(value, list) else value
+
+
+def _labels(pairs: List[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# The registry of this process
+REGISTRY = Registry()
+
+
+def reset():
+    """
+    Process pool initializer: forked workers start from empty metrics instead
+    of the parent's values.
+    """
+    REGISTRY.reset()
+
+
+def size_label(size) -> str:
+    # (houses, attributes) -> "5*6", as in the dataset's size column
+    return "*".join(str(n) for n in size)
+
+
+class MetricsTest(unittest.TestCase):
+    def testExportAndMerge(self):
+        registry = Registry()
+        solved = registry.counter("puzzles_total", "Puzzles by size and status.", ("size", "status"))
+        latency = registry.histogram("solve_seconds", "Solve latency.", ("size",), buckets=(0.1, 1.0))
+        solved.inc(size="5*6", status="solved")
+        latency.observe(0.05, size="5*6")
+        latency.observe(2.0, size="5*6")
+
+        text = registry.to_prometheus()
+        self.assertIn('zebra_puzzles_total{size="5*6",status="solved"} 1', text)
+        self.assertIn('zebra_solve_seconds_bucket{size="5*6",le="1.0"} 1', text)
+        self.assertIn('zebra_solve_seconds_bucket{size="5*6",le="+Inf"} 2', text)
+        self.assertIn('zebra_solve_seconds_count{size="5*6"} 2', text)
+
+        other = Registry()
+        other.merge(registry.drain())
+        other.merge(json.loads(json.dumps(other.snapshot())))
+        self.assertEqual(other.metrics["puzzles_total"].get(size="5*6", status="solved"), 2)
+        self.assertEqual(other.metrics["solve_seconds"].count(size="5*6"), 4)
+        self.assertEqual(registry.metrics["solve_seconds"].count(size="5*6"), 0)
@@ -0,0 +1,171 @@
+import asyncio
+import os
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, Optional, Tuple
+
+from classes import RawProblem, ParsedProblem
+from parser import Parser
+from decompose import DecomposingSolver
+from logs import get_logger
+import metrics
+
+log = get_logger("pipeline")
+
+# Stages, each connected to the next by a bounded asyncio.Queue:
+#   ingest (thread) -> parse (process pool) -> solve (process pool) -> emit (event loop)
+# A full queue suspends the stage feeding it, so at most about
+# 3 * queue_size + 2 * jobs puzzles are in memory whatever the dataset size.
+
+_DONE = object()
+
+
+class _Failed:
+    """
+    A puzzle whose parse or solve raised; it passes the later stages as is.
+    """
+    def __init__(self, raw: RawProblem, error: Exception):
+        self.raw = raw
+        self.error = error
+
+
+def _raw_of(item) -> RawProblem:
+    # Parse stage items are RawProblems, solve stage items (raw, parsed)
+    return item if isinstance(item, RawProblem) else item[0]
+
+
+def _log_error(raw: RawProblem, error: Exception):
+    log.warning("Puzzle %s failed: %s: %s", raw.ID, type(error).__name__, error)
+
+# One parser per worker process
+_parser: Optional[Parser] = None
+
+
+def parse_problem(raw: RawProblem, grid_mode: bool = True) -> Tuple[RawProblem, ParsedProblem]:
+    global _parser
+    if _parser is None:
+        _parser = Parser()
+    parsed = _parser.parseGridmode(raw) if grid_mode else _parser.parseMultipleChoice(raw)
+    return raw, parsed
+
+
+def solve_problem(item: Tuple[RawProblem, ParsedProblem], max_nodes: Optional[int] = None,
+                  time_limit: Optional[float] = None, unique: bool = False):
+    """
+    Returns (raw, parsed, result): the Solution, or (uniqueness, steps) with unique=True.
+    """
+    raw, parsed = item
+    solver = DecomposingSolver(max_nodes=max_nodes, time_limit=time_limit)
+    if unique:
+        return raw, parsed, (solver.uniqueness(parsed), solver.steps)
+    return raw, parsed, solver.solve(parsed)
+
+
+def _measured(fn: Callable, item):
+    # Runs in a worker: the result plus the metrics it recorded, for the parent
+    return fn(item), metrics.REGISTRY.drain()
+
+
+async def run_pipeline(source: Iterable[RawProblem], parse: Callable, solve: Callable, emit: Callable,
+                       jobs: Optional[int] = None, queue_size: int = 32, error: Callable = _log_error) -> int:
+    """
+    Streams every puzzle of `source` through parse and solve in a process pool
+    and calls emit(result) on the event loop as soon as each result is ready.
+    A puzzle whose parse or solve raises is reported with error(raw, exception)
+    instead, the others go on. Results arrive in completion order. Returns the
+    number of puzzles emitted or reported.
+    """
+    loop = asyncio.get_running_loop()
+    raw_q, parsed_q, solved_q = (asyncio.Queue(maxsize=queue_size) for _ in range(3))
+    # One task per pool worker and stage keeps every worker busy
+    workers = jobs or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(workers, initializer=metrics.reset) as pool:
+
+        async def ingest():
+            # Reading the source may block on disk, keep it off the event loop
+            it = iter(source)
+            while True:
+                raw = await loop.run_in_executor(None, next, it, _DONE)
+                if raw is _DONE:
+                    break
+                await raw_q.put(raw)
+            for _ in range(workers):
+                await raw_q.put(_DONE)
+
+        async def stage(inbox: asyncio.Queue, outbox: asyncio.Queue, fn: Callable):
+            while True:
+                item = await inbox.get()
+                if item is _DONE:
+                    await outbox.put(_DONE)
+                    return
+                if not isinstance(item, _Failed):
+                    try:
+                        result, recorded = await loop.run_in_executor(pool, _measured, fn, item)
+                        metrics.REGISTRY.merge(recorded)
+                        item = result
+                    except Exception as e:
+                        item = _Failed(_raw_of(item), e)
+                await outbox.put(item)
+
+        async def write() -> int:
+            count, finished = 0, 0
+            while finished < workers:
+                item = await solved_q.get()
+                if item is _DONE:
+                    finished += 1
+                    continue
+                if isinstance(item, _Failed):
+                    error(item.raw, item.error)
+                else:
+                    emit(item)
+                count += 1
+            return count
+
+        tasks = [ingest()]
+        tasks += [stage(raw_q, parsed_q, parse) for _ in range(workers)]
+        tasks += [stage(parsed_q, solved_q, solve) for _ in range(workers)]
+        results = await asyncio.gather(write(), *tasks)
+
+    return results[0]
+
+
+def stream(source: Iterable[RawProblem], emit: Callable, grid_mode: bool = True, unique: bool = False,
+           max_nodes: Optional[int] = None, time_limit: Optional[float] = None,
+           jobs: Optional[int] = None, queue_size: int = 32, error: Callable = _log_error) -> int:
+    """
+    Synchronous entry point for run.py.
+    """
+    parse = partial(parse_problem, grid_mode=grid_mode)
+    solve = partial(solve_problem, max_nodes=max_nodes, time_limit=time_limit, unique=unique)
+    return asyncio.run(run_pipeline(source, parse, solve, emit, jobs, queue_size, error))
+
+
+class PipelineTest(unittest.TestCase):
+    TEXT = ("There are 2 houses, numbered 1 to 2 from left to right, as seen from across the street. "
+            "Each house is occupied by a different person. Each house has a unique attribute for each "
+            "of the following characteristics:\n - Each person has a unique name: `Arnold`, `Eric`\n"
+            " - Each person has a favorite color: `red`, `blue`\n\n## Clues:\n"
+            "1. The person who loves red is Arnold.\n")
+
+    def testStreamsEveryPuzzle(self):
+        source = (RawProblem(f"p{i}", self.TEXT, size="2*2") for i in range(20))
+
+        emitted = []
+        count = stream(source, emitted.append, jobs=2, queue_size=2, time_limit=5.0)
+
+        self.assertEqual(count, 20)
+        self.assertEqual(sorted(sol.ID for _, _, sol in emitted), sorted(f"p{i}" for i in range(20)))
+        self.assertTrue(all(sol.status == "solved" for _, _, sol in emitted))
+        # Metrics recorded in the workers arrive in this process
+        self.assertGreaterEqual(metrics.REGISTRY.metrics["puzzles_total"].get(size="2*2", status="solved"), 20)
+
+    def testErrorsDoNotStopTheRun(self):
+        source = [RawProblem("bad", None, size="2*2"), RawProblem("good", self.TEXT, size="2*2")]
+        emitted, failed = [], []
+        count = stream(source, emitted.append, jobs=2, error=lambda raw, e: failed.append(raw.ID))
+
+        self.assertEqual(count, 2)
+        self.assertEqual([sol.ID for _, _, sol in emitted], ["good"])
+        self.assertEqual(failed, ["bad"])
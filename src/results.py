@@ -0,0 +1,353 @@
+import csv
+import io
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+import unittest
+from typing import List, Optional, Set, Tuple
+
+from logs import get_logger
+
+log = get_logger("results")
+
+CSV = "csv"
+JSONL = "jsonl"
+PARQUET = "parquet"
+
+# Column types of Parquet results; other fields (id, status, error, ...) are
+# strings. grid_solution has the type of the dataset's `solution` column, so
+# results join against the puzzle file without any JSON parsing.
+INT_FIELDS = ("steps",)
+FLOAT_FIELDS = ("seconds",)
+GRID_FIELDS = ("grid_solution",)
+
+# A Parquet result path is a directory of these. A part is written once
+# batch_size rows are pending or PART_SECONDS after the previous one.
+PART = "part-{:05d}.parquet"
+PART_SECONDS = 5.0
+
+_STOP = object()
+
+
+class ResultWriter:
+    """
+    Writes result rows (dicts) incrementally from a background thread.
+
+    Rows are queued by write() and appended to the file in batches, each batch
+    flushed to disk, so a crash loses at most the rows still in the queue.
+    With resume=True the ids already in the file are loaded into `done` and
+    new rows are appended, which lets an interrupted run continue.
+
+    *.parquet paths are directories of Parquet part files, each renamed into
+    place once complete, so a killed run leaves only whole parts and resume
+    works as for CSV; it loses the rows of the part not yet written too.
+    pq.read_table(path) reads them all.
+
+        with ResultWriter("results.csv", ["id", "grid_solution", "steps"], resume=True) as out:
+            for puzzle in puzzles:
+                if puzzle.ID in out.done:
+                    continue
+                out.write({"id": puzzle.ID, ...})
+    """
+
+    def __init__(self, path: str, fields: Optional[List[str]] = None, fmt: Optional[str] = None,
+                 resume: bool = False, batch_size: int = 64, queue_size: int = 1024):
+        self.path = path
+        self.format = fmt or (JSONL if path.endswith((".jsonl", ".json")) else PARQUET if path.endswith(".parquet") else CSV)
+        self.fields = fields
+        self.batch_size = batch_size
+        self.done: Set[str] = set()
+        self.written = 0
+
+        if self.format in (CSV, PARQUET) and not fields:
+            raise ValueError(f"{self.format.upper()} output needs the list of fields")
+
+        if self.format == PARQUET:
+            self._file = None
+            self._open_parquet(resume)
+        else:
+            self._open_text(resume)
+
+        self._error: Optional[BaseException] = None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="ResultWriter", daemon=True)
+        self._thread.start()
+
+    def _open_text(self, resume: bool):
+        path, fields = self.path, self.fields
+        if resume and os.path.exists(path):
+            self.done = self._load_done()
+        elif os.path.exists(path):
+            os.remove(path)
+
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        if new_file and self.format == CSV:
+            buf = io.StringIO()
+            csv.writer(buf, lineterminator="\n").writerow(fields)
+            self._file.write(buf.getvalue())
+            self._file.flush()
+
+    def _open_parquet(self, resume: bool):
+        import pyarrow.parquet as pq
+
+        self._schema = parquet_schema(self.fields)
+        self._parts = 0
+        self._pending: List[dict] = []
+        self._last_part = time.monotonic()
+        previous = None
+        if os.path.isfile(self.path):
+            # A single file from before results were written in parts
+            if resume:
+                try:
+                    previous = pq.read_table(self.path).select(self.fields).cast(self._schema)
+                except Exception as e:
+                    kept = self.path + ".incomplete"
+                    log.warning("Cannot resume from %s (%s), keeping it as %s", self.path, e, kept)
+                    os.replace(self.path, kept)
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+        os.makedirs(self.path, exist_ok=True)
+        parts = []
+        for name in sorted(os.listdir(self.path)):
+            if name.startswith(".part-") or (name.startswith("part-") and not resume):
+                os.remove(os.path.join(self.path, name))  # unfinished, or from a run not resumed
+            elif name.startswith("part-"):
+                parts.append(name)
+
+        if parts:
+            self.done = set(pq.read_table(self.path, columns=["id"]).column("id").to_pylist())
+            self._parts = int(parts[-1][len("part-"):-len(".parquet")]) + 1
+        if previous is not None:
+            self.done = set(previous.column("id").to_pylist())
+            self._write_part(previous)
+
+    def write(self, row: dict):
+        """
+        Queues one row. Blocks only if the writer thread is queue_size rows behind.
+        """
+        if self._error is not None:
+            raise self._error
+        self._queue.put(row)
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        if self._file is not None:
+            self._file.close()
+        elif self._pending or self._parts == 0:
+            # The rest, or an empty part so the result reads back with its columns
+            self._write_part(to_arrow(self._pending, self.fields))
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            # Block for the first row, then take whatever else is already queued
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if batch[-1] is _STOP:
+                batch.pop()
+                stop = True
+            elif _STOP in batch:
+                batch = [r for r in batch if r is not _STOP]
+                stop = True
+
+            if not batch or self._error is not None:
+                continue
+
+            try:
+                if self._file is None:
+                    self._write_parquet(batch)
+                else:
+                    self._file.write(self._encode(batch))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                self.written += len(batch)
+            except BaseException as e:
+                self._error = e
+
+    def _encode(self, rows: List[dict]) -> str:
+        """
+        Encodes a whole batch into one string, written with a single call.
+        Dict and list values (e.g. a grid_solution) become JSON text in CSV
+        cells and nested JSON in JSONL.
+        """
+        if self.format == JSONL:
+            return "".join(json.dumps(r, default=str) + "\n" for r in rows)
+
+        rows = [{k: json.dumps(v) if isinstance(v, (dict, list)) else v for k, v in r.items()} for r in rows]
+        buf = io.StringIO()
+        csv.DictWriter(buf, fieldnames=self.fields, extrasaction="ignore", lineterminator="\n").writerows(rows)
+        return buf.getvalue()
+
+    def _write_parquet(self, rows: List[dict]):
+        self._pending.extend(rows)
+        if len(self._pending) >= self.batch_size or time.monotonic() - self._last_part >= PART_SECONDS:
+            self._write_part(to_arrow(self._pending, self.fields))
+
+    def _write_part(self, table):
+        import pyarrow.parquet as pq
+
+        name = PART.format(self._parts)
+        partial = os.path.join(self.path, "." + name)
+        with open(partial, "wb") as f:
+            pq.write_table(table, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(partial, os.path.join(self.path, name))
+        self._parts += 1
+        self._pending = []
+        self._last_part = time.monotonic()
+
+    def _load_done(self) -> Set[str]:
+        """
+        Ids already written. A torn last line from a crash is cut off first.
+        """
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                f.truncate(end)
+                data = data[:end]
+
+        text = data.decode("utf-8")
+        if self.format == JSONL:
+            done = set()
+            for line in text.splitlines():
+                try:
+                    done.add(str(json.loads(line)["id"]))
+                except (ValueError, KeyError, TypeError):
+                    continue
+            return done
+
+        return {row["id"] for row in csv.DictReader(io.StringIO(text)) if row.get("id")}
+
+
+def solution_type():
+    """
+    The Arrow type of the dataset's `solution` column.
+    """
+    import pyarrow as pa
+    return pa.struct([("header", pa.list_(pa.string())), ("rows", pa.list_(pa.list_(pa.string())))])
+
+
+def read_rows(path: str) -> Tuple[List[str], List[dict]]:
+    """
+    (fields, rows) of a result file written by ResultWriter.
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        return table.column_names, table.to_pylist()
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".json")):
+            rows = [json.loads(line) for line in f if line.strip()]
+            return (list(rows[0]) if rows else []), rows
+        reader = csv.DictReader(f)
+        return list(reader.fieldnames or []), list(reader)
+
+
+def to_arrow(rows: List[dict], fields: List[str]):
+    """
+    Result rows as an Arrow table with parquet_schema(fields). Values read
+    back from CSV (text numbers, grids as JSON text) are converted.
+    """
+    import pyarrow as pa
+
+    columns = {}
+    for field in fields:
+        values = [row.get(field) for row in rows]
+        if field in GRID_FIELDS:
+            # {} or an empty cell = no grid
+            values = [json.loads(v) if isinstance(v, str) and v else v for v in values]
+            values = [v if v else None for v in values]
+        elif field in INT_FIELDS:
+            values = [None if v in (None, "") else int(v) for v in values]
+        elif field in FLOAT_FIELDS:
+            values = [None if v in (None, "") else float(v) for v in values]
+        else:
+            values = [None if v is None else str(v) for v in values]
+        columns[field] = values
+    return pa.Table.from_pydict(columns, schema=parquet_schema(fields))
+
+
+def parquet_schema(fields: List[str]):
+    import pyarrow as pa
+
+    def column_type(field):
+        if field in GRID_FIELDS:
+            return solution_type()
+        if field in INT_FIELDS:
+            return pa.int64()
+        if field in FLOAT_FIELDS:
+            return pa.float64()
+        return pa.string()
+    return pa.schema([(field, column_type(field)) for field in fields])
+
+
+class ResultWriterTest(unittest.TestCase):
+    def testResumeSkipsWrittenIds(self):
+        for name in ("out.csv", "out.jsonl"):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, name)
+                with ResultWriter(path, ["id", "steps"], batch_size=2) as out:
+                    for i in range(5):
+                        out.write({"id": f"p{i}", "steps": i})
+
+                # Simulate a crash in the middle of a line
+                with open(path, "a") as f:
+                    f.write('p5,"{')
+
+                with ResultWriter(path, ["id", "steps"], resume=True) as out:
+                    self.assertEqual(out.done, {"p0", "p1", "p2", "p3", "p4"})
+                    out.write({"id": "p5", "steps": 5})
+
+                with ResultWriter(path, ["id", "steps"], resume=True) as out:
+                    self.assertEqual(len(out.done), 6)
+
+    def testParquetResume(self):
+        import pyarrow.parquet as pq
+
+        fields = ["id", "grid_solution", "steps", "status"]
+        grid = {"header": ["name", "color"], "rows": [["alice", "blue"], ["bob", None]]}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.parquet")
+            with ResultWriter(path, fields, batch_size=2) as out:
+                for i in range(3):
+                    out.write({"id": f"p{i}", "grid_solution": grid, "steps": i, "status": "solved"})
+
+            # A batch the killed run did not finish writing
+            with open(os.path.join(path, "." + PART.format(9)), "wb") as f:
+                f.write(b"PAR1")
+
+            with ResultWriter(path, fields, resume=True) as out:
+                self.assertEqual(out.done, {"p0", "p1", "p2"})
+                out.write({"id": "p3", "grid_solution": "{}", "steps": 0, "status": "failed"})
+
+            table = pq.read_table(path)
+            self.assertEqual(table.schema.field("grid_solution").type, solution_type())
+            self.assertEqual(table.column("id").to_pylist(), ["p0", "p1", "p2", "p3"])
+            self.assertEqual(table.column("grid_solution").to_pylist(), [grid] * 3 + [None])
+            self.assertFalse(any(name.startswith(".") for name in os.listdir(path)))
+
+            with ResultWriter(path, fields) as out:
+                pass
+            self.assertEqual(pq.read_table(path).num_rows, 0)
@@ -1,16 +1,19 @@
 import sys
 
-import pandas as pd
-import pyarrow.parquet as pq
-
 from argparse import ArgumentParser
-from parser import Parser
-from solver import Solver
+from source import PuzzleSource
+from pipeline import stream
+from results import ResultWriter
+from metrics import REGISTRY
+from logs import configure as configure_logs, get_logger
+from shard import parse_shard, in_shard, shard_path
 from classes import RawProblem, Solution
 import json
 
+log = get_logger("run")
 
 def read_row_from_parquet(path: str, row_index: int):
+	import pandas as pd
 	df = pd.read_parquet(path)  # requires pyarrow or fastparquet
 	try:
 		row = df.iloc[row_index]
@@ -19,60 +22,127 @@ def read_row_from_parquet(path: str, row_index: int):
 	return row.to_dict()
 
 
-def readGridMode(row) -> RawProblem:
-	return RawProblem(row["id"], row["puzzle"], size=row["size"])
-def readMC(row) -> RawProblem :
-	return  RawProblem(row["id"], row["puzzle"], question=row["question"], choiches=row["choices"])
+def gridSolution(sol: Solution) -> dict:
+	return {"header": list(sol.entities), "rows": sol.rows()}
 
-def answerGridMode(sol: Solution):
-	header = list(sol.entities)
-	asDict = {
-		"header": header,
-		"rows": []
-	}
-	for i in range(len(sol.ppl)):
-		row = []
-		for entity in header:
-			row.append(sol.ppl[i].get(entity))
+def multipleChoiceAnswer(sol: Solution, parsed, raw: RawProblem):
+	"""
+	The choice found in the house the question asks about, None if the grid does not decide it.
+	"""
+	rows = sol.rows()
+	if not 0 < parsed.houseNumber <= len(rows):
+		return None
+	values = rows[parsed.houseNumber - 1]
+	for choice in raw.choiches:
+		if choice in values:
+			return choice
+	return None
 
-	print(f"{sol.ID}|{json.dumps(asDict)}|{sol.steps}")
-	pass
+def answerGridMode(sol: Solution, out: ResultWriter = None):
+	asDict = gridSolution(sol)
 
-def main():
-	argParse = ArgumentParser()
-	argParse.add_argument("-f", "--file", type=str, help="Path to the Parquet file containing problems.", dest="file")
-	argParse.add_argument("-gm", "--GridMode", type=bool, dest="grid_mode")
-	argParse.add_argument("-mc", "--MultipleChoice", type=bool, dest="multiple_choice")
+	if out is not None:
+		# Encoded with the rest of its batch by the writer thread
+		out.write({"id": sol.ID, "grid_solution": asDict, "steps": sol.steps, "status": sol.status, "seconds": sol.seconds})
+		return
 
-	args = argParse.parse_args()
+	print(f"{sol.ID}|{json.dumps(asDict)}|{sol.steps}|{sol.status}")
 
-	if not (args.grid_mode or args.multiple_choice):
-		print("no mode provided")
-		sys.exit(1)
+def answerMultipleChoice(sol: Solution, parsed, raw: RawProblem, out: ResultWriter = None):
+	answer = multipleChoiceAnswer(sol, parsed, raw)
+	if out is not None:
+		out.write({"id": sol.ID, "answer": answer, "steps": sol.steps, "status": sol.status, "seconds": sol.seconds})
+		return
 
-	df = pd.DataFrame()
-	rawProblems = pd.Series(dtype=object)
+	print(f"{sol.ID}|{answer}|{sol.steps}|{sol.status}")
 
-	if args.grid_mode:
-		df: pd.DataFrame = pq.read_table(args.file, columns=["id", "size", "puzzle", "solution"]).to_pandas().head(100)
-		rawProblems = df.apply(readGridMode , axis=1)
-	elif args.multiple_choice:
-		df: pd.DataFrame = pq.read_table(args.file, columns=["id", "puzzle", "question", "choices"]).to_pandas().head(100)
-		rawProblems = df.apply(readMC , axis=1)
+def reportUniqueness(puzzleId: str, status: str, steps: int, out: ResultWriter = None):
+	if out is not None:
+		out.write({"id": puzzleId, "uniqueness": status, "steps": steps})
+		return
 
-	parser = Parser()
+	print(f"{puzzleId}|{status}|{steps}")
 
-	parsedProblems = rawProblems.apply(lambda raw: parser.parseGridmode(raw) if args.grid_mode else parser.parseMultipleChoice(raw))
+def reportError(puzzleId: str, error: Exception, unique: bool, out: ResultWriter = None):
+	# Same columns as a result row, with status (or uniqueness) "error"
+	message = f"{type(error).__name__}: {error}"
+	if out is not None:
+		out.write({"id": puzzleId, "uniqueness" if unique else "status": "error", "steps": 0, "error": message})
+		return
 
-	print(len(parsedProblems))
+	print(f"{puzzleId}|error|{message}")
 
-	solver = Solver()
+def main():
+	argParse = ArgumentParser()
+	argParse.add_argument("-f", "--file", type=str, help="Path to the puzzle file (Parquet, JSON or CSV).", dest="file")
+	argParse.add_argument("-gm", "--GridMode", type=bool, dest="grid_mode")
+	argParse.add_argument("-mc", "--MultipleChoice", type=bool, dest="multiple_choice")
+	argParse.add_argument("-n", "--limit", type=int, default=None, dest="limit", help="Number of puzzles to read, 0 for all (default 100, all with --shard).")
+	argParse.add_argument("-o", "--output", type=str, dest="output", help="Write results to this .csv, .jsonl or .parquet file (a directory of parts) instead of printing them.")
+	argParse.add_argument("-r", "--resume", action="store_true", dest="resume", help="Keep the rows already in --output and skip their ids.")
+	argParse.add_argument("--max-nodes", type=int, default=None, dest="max_nodes", help="Search node budget per puzzle.")
+	argParse.add_argument("--time-limit", type=float, default=10.0, dest="time_limit", help="Wall-clock budget per puzzle in seconds (0 = unlimited).")
+	argParse.add_argument("-j", "--jobs", type=int, default=0, dest="jobs", help="Worker processes for parsing and solving (0 = CPU count).")
+	argParse.add_argument("-u", "--unique", action="store_true", dest="unique", help="Report whether each puzzle has a unique/multiple/no solution instead of solving it.")
+	argParse.add_argument("--metrics", type=str, dest="metrics", help="Write run metrics to this file at the end: .json snapshot, else Prometheus text.")
+	argParse.add_argument("--shard", type=parse_shard, default=None, dest="shard", help="i/N: solve only shard i of N (by stable hash of the id). --output and --metrics get a .shard-i-of-N suffix; merge them with shard.py.")
+	argParse.add_argument("--log-level", type=str, default=None, dest="log_level", help="DEBUG, INFO, WARNING (default, or $ZEBRA_LOG_LEVEL) or ERROR.")
+	argParse.add_argument("--log-json", type=str, default=None, dest="log_json", help="Also write the log as JSON lines to this file.")
 
-	solutions = parsedProblems.apply(lambda parsed: solver.solve(parsed))
+	args = argParse.parse_args()
+	configure_logs(args.log_level, args.log_json)
 
+	if not (args.grid_mode or args.multiple_choice):
+		print("no mode provided")
+		sys.exit(1)
 
-	if args.grid_mode:
-		solutions.apply(answerGridMode)
+	if args.limit is None:
+		# A shard is part of a full run, a limit would leave most of the input out
+		args.limit = 0 if args.shard is not None else 100
+
+	if args.shard is not None:
+		args.output = args.output and shard_path(args.output, args.shard)
+		args.metrics = args.metrics and shard_path(args.metrics, args.shard)
+
+	out = None
+	if args.output:
+		if args.unique:
+			fields = ["id", "uniqueness", "steps", "error"]
+		elif args.grid_mode:
+			fields = ["id", "grid_solution", "steps", "status", "seconds", "error"]
+		else:
+			fields = ["id", "answer", "steps", "status", "seconds", "error"]
+		out = ResultWriter(args.output, fields, resume=args.resume)
+
+	# Format (parquet / JSON / CSV) and mode columns are detected by the source
+	rawProblems = (raw for raw in PuzzleSource(args.file, limit=args.limit or None) if (out is None or raw.ID not in out.done) and in_shard(raw.ID, args.shard))
+
+	def emit(item):
+		raw, parsed, result = item
+		if args.unique:
+			reportUniqueness(parsed.ID, *result, out)
+		elif args.grid_mode:
+			answerGridMode(result, out)
+		else:
+			answerMultipleChoice(result, parsed, raw, out)
+
+	def error(raw, e):
+		log.warning("Puzzle %s failed: %s: %s", raw.ID, type(e).__name__, e)
+		reportError(raw.ID, e, args.unique, out)
+
+	# Puzzles stream through read -> parse -> solve -> write, so results appear while
+	# later puzzles are still being read. Budgets keep the tail latency predictable;
+	# timed out puzzles report the best partial grid.
+	count = stream(rawProblems, emit, grid_mode=bool(args.grid_mode), unique=args.unique,
+		max_nodes=args.max_nodes, time_limit=args.time_limit or None, jobs=args.jobs or None, error=error)
+
+	print(count)
+
+	if out is not None:
+		out.close()
+
+	if args.metrics:
+		REGISTRY.write(args.metrics)
 
 if __name__ == "__main__":
 	main()
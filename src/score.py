@@ -0,0 +1,197 @@
+import os
+import sys
+import tempfile
+import unittest
+from typing import Optional
+
+import numpy as np
+
+from results import ResultWriter, read_rows, to_arrow
+
+# Scores a results file against the puzzle file it was solved from, as a
+# columnar join on id (pyarrow), without parsing any grid per row:
+# - grid mode: a predicted cell is correct if the true grid has the same
+#   value in the same house (case-insensitive, "_" = " "). Column names are
+#   not compared, the parsers name the categories differently from the
+#   dataset. A puzzle is exact if every true cell is predicted.
+# - multiple choice: the answer equals the dataset's answer.
+#
+#   python score.py out.parquet -f ../Gridmode-00000-of-00001.parquet [-o scores.parquet]
+#
+# Parquet results (run.py -o out.parquet) are read as they are; CSV and JSONL
+# results are converted first.
+
+
+def load_results(path: str):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return pq.read_table(path)
+    fields, rows = read_rows(path)
+    return to_arrow(rows, fields)
+
+
+def _starts(parents: np.ndarray) -> np.ndarray:
+    # Position of each list element within its (sorted) parent list
+    return np.arange(len(parents)) - np.searchsorted(parents, parents)
+
+
+def cells(ids, grids):
+    """
+    Table (id, house, value) with one row per cell of a `solution` struct
+    column; house columns ("House" in the header) are left out.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    rows = pc.struct_field(grids, "rows")
+    headers = pc.struct_field(grids, "header")
+
+    house_puzzle = pc.list_parent_indices(rows).to_numpy()
+    house_rows = pc.list_flatten(rows)
+    cell_house = pc.list_parent_indices(house_rows).to_numpy()
+    values = pc.list_flatten(house_rows)
+    cell_puzzle = house_puzzle[cell_house]
+    column = _starts(cell_house)
+
+    # The header entry of each cell, if the header is that long
+    header_puzzle = pc.list_parent_indices(headers).to_numpy()
+    is_house = pc.equal(pc.utf8_lower(pc.list_flatten(headers)), "house").to_numpy(zero_copy_only=False)
+    slot = np.searchsorted(header_puzzle, cell_puzzle) + column
+    inside = slot < len(header_puzzle)
+    inside[inside] = header_puzzle[slot[inside]] == cell_puzzle[inside]
+    house_cell = np.zeros(len(slot), dtype=bool)
+    house_cell[inside] = is_house[slot[inside]]
+
+    keep = pc.is_valid(values).to_numpy(zero_copy_only=False) & ~house_cell
+    table = pa.table({
+        "id": pc.take(ids, pa.array(cell_puzzle, pa.int64())),
+        "house": pa.array(_starts(house_puzzle)[cell_house], pa.int64()),
+        "value": pc.replace_substring(pc.utf8_lower(values), "_", " "),
+    })
+    return table.filter(pa.array(keep))
+
+
+def _size_of(table):
+    import pyarrow.compute as pc
+    # "lgp-test-5x6-16#mc-3" -> "5*6", the size column of Gridmode
+    parts = pc.extract_regex(table.column("id"), r"-(?P<houses>\d+)x(?P<attributes>\d+)-")
+    return pc.binary_join_element_wise(pc.struct_field(parts, "houses"), pc.struct_field(parts, "attributes"), "*")
+
+
+def score(results, puzzles):
+    """
+    Per-puzzle scores: the results table joined with the puzzle table on id.
+    Grid mode adds cells / correct / exact, multiple choice adds correct.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if "size" not in puzzles.column_names:
+        puzzles = puzzles.append_column("size", _size_of(puzzles))
+
+    if "solution" in puzzles.column_names:
+        truth = cells(puzzles.column("id"), puzzles.column("solution"))
+        predicted = cells(results.column("id"), results.column("grid_solution"))
+        predicted = predicted.group_by(["id", "house", "value"]).aggregate([])  # distinct
+        correct = predicted.join(truth, ["id", "house", "value"], join_type="inner")
+
+        counts = truth.group_by("id").aggregate([("value", "count")]).rename_columns(["id", "cells"])
+        hits = correct.group_by("id").aggregate([("value", "count")]).rename_columns(["id", "correct"])
+        table = (results.drop_columns(["grid_solution"])
+                 .join(puzzles.select(["id", "size"]), "id")
+                 .join(counts, "id", join_type="left outer")
+                 .join(hits, "id", join_type="left outer"))
+        table = table.set_column(table.column_names.index("correct"), "correct",
+                                 pc.fill_null(table.column("correct"), 0))
+        return table.append_column("exact", pc.and_(pc.greater(table.column("cells"), 0),
+                                                    pc.equal(table.column("correct"), table.column("cells"))))
+
+    truth = puzzles.select(["id", "size", "answer"]).rename_columns(["id", "size", "truth"])
+    table = results.join(truth, "id")
+    correct = pc.equal(pc.utf8_lower(table.column("answer")), pc.utf8_lower(table.column("truth")))
+    return table.append_column("correct", pc.fill_null(correct, False))
+
+
+def summary(scores) -> list:
+    """
+    One dict per puzzle size (sorted) plus "all": puzzles, solved, accuracy
+    (exact grids or correct answers), cell_accuracy (grid mode) and mean
+    seconds / steps.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    grid = "exact" in scores.column_names
+    scores = scores.append_column("solved", pc.equal(scores.column("status"), "solved"))
+    scores = scores.append_column("all", pa.array(["all"] * scores.num_rows))
+    aggregates = [("id", "count"), ("solved", "sum"), ("exact" if grid else "correct", "sum"), ("steps", "mean")]
+    if grid:
+        aggregates += [("correct", "sum"), ("cells", "sum")]
+    if "seconds" in scores.column_names:
+        aggregates.append(("seconds", "mean"))
+
+    out = []
+    for key in ("size", "all"):
+        for row in sorted(scores.group_by(key).aggregate(aggregates).to_pylist(), key=lambda r: r[key] or ""):
+            entry = {"size": row[key], "puzzles": row["id_count"], "solved": row["solved_sum"],
+                     "accuracy": row[("exact" if grid else "correct") + "_sum"] / row["id_count"],
+                     "steps": row["steps_mean"], "seconds": row.get("seconds_mean")}
+            if grid:
+                entry["cell_accuracy"] = row["correct_sum"] / row["cells_sum"] if row["cells_sum"] else 0.0
+            out.append(entry)
+    return out
+
+
+def score_files(results_path: str, puzzles_path: str, out_path: Optional[str] = None) -> list:
+    import pyarrow.parquet as pq
+
+    scores = score(load_results(results_path), pq.read_table(puzzles_path))
+    if out_path is not None:
+        pq.write_table(scores, out_path)
+    return summary(scores)
+
+
+class ScoreTest(unittest.TestCase):
+    def testGridScores(self):
+        import pyarrow as pa
+        from results import solution_type
+
+        truth = {"header": ["House", "Name", "Color"], "rows": [["1", "Alice", "red"], ["2", "Bob", "light blue"]]}
+        puzzles = pa.table({"id": ["lgp-test-2x2-1", "lgp-test-2x2-2", "lgp-test-2x2-3"], "size": ["2*2"] * 3,
+                            "solution": pa.array([truth] * 3, solution_type())})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.csv")
+            with ResultWriter(path, ["id", "grid_solution", "steps", "status"]) as out:
+                out.write({"id": "lgp-test-2x2-1", "status": "solved", "steps": 4, "grid_solution":
+                           {"header": ["name", "color"], "rows": [["alice", "red"], ["bob", "light_blue"]]}})
+                out.write({"id": "lgp-test-2x2-2", "status": "timeout", "steps": 9, "grid_solution":
+                           {"header": ["name", "color"], "rows": [["alice", None], ["bob", "red"]]}})
+                out.write({"id": "lgp-test-2x2-3", "status": "failed", "steps": 2, "grid_solution": {}})
+            scores = score(load_results(path), puzzles)
+
+        by_id = {row["id"]: row for row in scores.to_pylist()}
+        self.assertEqual([(by_id[f"lgp-test-2x2-{i}"]["correct"], by_id[f"lgp-test-2x2-{i}"]["exact"]) for i in (1, 2, 3)],
+                         [(4, True), (2, False), (0, False)])
+        total = summary(scores)[-1]
+        self.assertEqual((total["size"], total["puzzles"], total["solved"]), ("all", 3, 1))
+        self.assertAlmostEqual(total["cell_accuracy"], 6 / 12)
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    argParse = ArgumentParser(description="Score a results file against the puzzle file")
+    argParse.add_argument("results", type=str, help="Results of run.py (.parquet, .csv or .jsonl).")
+    argParse.add_argument("-f", "--file", type=str, required=True, dest="file", help="The puzzle parquet file with the solution / answer column.")
+    argParse.add_argument("-o", "--output", type=str, default=None, dest="output", help="Write the per-puzzle scores to this parquet file.")
+    args = argParse.parse_args()
+
+    rows = score_files(args.results, args.file, args.output)
+    grid = "cell_accuracy" in rows[0] if rows else False
+    print(f"{'size':>6} {'puzzles':>8} {'solved':>7} {'accuracy':>9}" + (f" {'cells':>7}" if grid else "") + f" {'steps':>9} {'seconds':>8}")
+    for row in rows:
+        seconds = f"{row['seconds']:8.3f}" if row["seconds"] is not None else f"{'-':>8}"
+        print(f"{row['size'] or '-':>6} {row['puzzles']:8d} {row['solved']:7d} {row['accuracy']:9.3f}"
+              + (f" {row['cell_accuracy']:7.3f}" if grid else "") + f" {row['steps']:9.1f} {seconds}")
+    sys.exit(0 if rows else 1)
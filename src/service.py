@@ -0,0 +1,345 @@
+import json
+import os
+import queue
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+from classes import RawProblem
+from parser import Parser
+from decompose import DecomposingSolver
+from metrics import REGISTRY, reset as reset_metrics
+from logs import configure as configure_logs
+from run import gridSolution, multipleChoiceAnswer
+
+DEFAULT_PORT = 8765
+
+_STOP = object()
+
+_REQUESTS = REGISTRY.counter("http_requests_total", "POST /solve requests by response code.", ("code",))
+_REQUEST_SECONDS = REGISTRY.histogram("http_request_seconds", "POST /solve latency, queueing included.")
+
+# Per-process parser / solver, created once by _init_worker
+_parser: Optional[Parser] = None
+_solver: Optional[DecomposingSolver] = None
+
+
+def _init_worker(max_nodes, time_limit):
+    global _parser, _solver
+    reset_metrics()
+    _parser = Parser()
+    _solver = DecomposingSolver(max_nodes=max_nodes, time_limit=time_limit)
+
+
+def solve_request(request: dict) -> dict:
+    """
+    Solves one RawProblem given as JSON:
+        {"id", "puzzle" (or "text"), "size"}                 -> grid mode
+        {"id", "puzzle" (or "text"), "question", "choices"} -> multiple choice
+    """
+    raw = RawProblem(str(request.get("id", "")), request.get("puzzle", request.get("text", "")),
+                     size=request.get("size", ""), question=request.get("question", ""),
+                     choiches=request.get("choices", []))
+
+    if raw.question:
+        parsed = _parser.parseMultipleChoice(raw)
+    else:
+        parsed = _parser.parseGridmode(raw)
+    sol = _solver.solve(parsed)
+
+    result = {"id": raw.ID, "steps": sol.steps, "status": sol.status}
+    if raw.question:
+        result["answer"] = multipleChoiceAnswer(sol, parsed, raw)
+    else:
+        result["grid_solution"] = gridSolution(sol)
+    return result
+
+
+def _solve_batch(requests: List[dict]):
+    """
+    Returns the results and the metrics the worker recorded for them.
+    """
+    results = []
+    for request in requests:
+        try:
+            results.append(solve_request(request))
+        except Exception as e:
+            puzzle_id = request.get("id") if isinstance(request, dict) else None
+            results.append({"id": puzzle_id, "status": "error", "error": str(e)})
+    return results, REGISTRY.drain()
+
+
+class SolveService:
+    """
+    A pool of warm worker processes behind a bounded request queue.
+
+    submit() queues one request and returns a Future. A dispatcher thread
+    groups queued requests into batches of up to batch_size (waiting at most
+    batch_wait seconds for a batch to fill) and sends each batch to the pool as
+    one task. When queue_size requests are waiting, submit() raises queue.Full.
+    Cancelled futures are dropped from their batch if it has not been sent yet.
+    """
+
+    def __init__(self, workers: Optional[int] = None, batch_size: int = 8, batch_wait: float = 0.005,
+                 queue_size: int = 256, max_nodes: Optional[int] = None, time_limit: Optional[float] = 10.0):
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.queue_size = queue_size
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._submit_lock = threading.Lock()
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(max_nodes, time_limit))
+
+        # Start the workers now so the first request does not pay for it
+        for f in [self._pool.submit(_solve_batch, []) for _ in range(self.workers)]:
+            f.result()
+
+        self._dispatcher = threading.Thread(target=self._dispatch, name="SolveService", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, request: dict) -> Future:
+        return self.submit_all([request])[0]
+
+    def submit_all(self, requests: List[dict]) -> List[Future]:
+        """
+        Queues all requests or, if they do not all fit, none of them (queue.Full).
+        """
+        with self._submit_lock:
+            # Only submitters add to the queue, so the free space cannot shrink meanwhile
+            if self._queue.qsize() + len(requests) > self.queue_size:
+                raise queue.Full()
+            futures = [Future() for _ in requests]
+            for request, future in zip(requests, futures):
+                self._queue.put_nowait((request, future))
+        return futures
+
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._dispatcher.join()
+        self._pool.shutdown()
+
+    def _dispatch(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+
+            batch = [item]
+            deadline = time.perf_counter() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.put(_STOP)
+                    break
+                batch.append(item)
+
+            # A client that gave up cancelled its futures
+            batch = [(request, future) for request, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            requests = [request for request, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                task = self._pool.submit(_solve_batch, requests)
+            except Exception as e:
+                # Broken or shut down pool: fail the requests instead of leaving them waiting
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            task.add_done_callback(lambda done, futures=futures: _resolve(futures, done))
+
+
+def _resolve(futures: List[Future], done: Future):
+    error = done.exception()
+    if error is None:
+        results, recorded = done.result()
+        REGISTRY.merge(recorded)
+    for i, future in enumerate(futures):
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(results[i])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    POST /solve  body: one request object or a list of them
+    GET  /health
+    GET  /metrics       Prometheus text format
+    GET  /metrics.json  JSON snapshot
+    """
+    service: SolveService
+    timeout_s: float = 60.0
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            return self._reply_text(200, REGISTRY.to_prometheus(), "text/plain; version=0.0.4")
+        if self.path == "/metrics.json":
+            return self._reply_text(200, REGISTRY.to_json(), "application/json")
+        if self.path != "/health":
+            return self._reply(404, {"error": "not found"})
+        self._reply(200, {"workers": self.service.workers, "queued": self.service.queued()})
+
+    def do_POST(self):
+        if self.path != "/solve":
+            return self._reply(404, {"error": "not found"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except ValueError as e:
+            return self._reply(400, {"error": f"invalid JSON: {e}"})
+
+        start = time.perf_counter()
+        requests = body if isinstance(body, list) else [body]
+        if not all(isinstance(request, dict) for request in requests):
+            return self._reply(400, {"error": "every request must be a JSON object"})
+        try:
+            futures = self.service.submit_all(requests)
+        except queue.Full:
+            _REQUESTS.inc(code="503")
+            return self._reply(503, {"error": "queue full"}, {"Retry-After": "1"})
+
+        deadline = time.perf_counter() + self.timeout_s
+        try:
+            results = [future.result(timeout=max(0.0, deadline - time.perf_counter())) for future in futures]
+        except FutureTimeout:
+            for future in futures:
+                future.cancel()
+            _REQUESTS.inc(code="504")
+            return self._reply(504, {"error": f"no result within {self.timeout_s}s"})
+        except Exception as e:
+            # e.g. a worker process died (BrokenProcessPool)
+            for future in futures:
+                future.cancel()
+            _REQUESTS.inc(code="500")
+            return self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+
+        self._reply(200, results if isinstance(body, list) else results[0])
+        _REQUESTS.inc(code="200")
+        _REQUEST_SECONDS.observe(time.perf_counter() - start)
+
+    def _reply(self, code: int, payload, headers: Optional[dict] = None):
+        self._reply_text(code, json.dumps(payload), "application/json", headers)
+
+    def _reply_text(self, code: int, text: str, content_type: str, headers: Optional[dict] = None):
+        data = text.encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(service: SolveService, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                timeout_s: float = _Handler.timeout_s) -> ThreadingHTTPServer:
+    handler = type("Handler", (_Handler,), {"service": service, "timeout_s": timeout_s})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(host: str = "127.0.0.1", port: int = DEFAULT_PORT, **kwargs):
+    service = SolveService(**kwargs)
+    server = make_server(service, host, port)
+    print(f"Serving on http://{host}:{server.server_port} with {service.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+class ServiceTest(unittest.TestCase):
+    def testSolveOverHttp(self):
+        service = SolveService(workers=1, time_limit=5.0)
+        server = make_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            puzzle = {
+                "id": "t-2x2", "size": "2*2",
+                "puzzle": "There are 2 houses, numbered 1 to 2 from left to right, as seen from across the street. "
+                          "Each house is occupied by a different person. Each house has a unique attribute for each "
+                          "of the following characteristics:\n - Each person has a unique name: `Arnold`, `Eric`\n"
+                          " - Each person has a favorite color: `red`, `blue`\n\n## Clues:\n"
+                          "1. The person who loves red is Arnold.\n",
+            }
+            url = f"http://127.0.0.1:{server.server_port}/solve"
+            body = json.dumps([puzzle, dict(puzzle, id="t-2x2-b")]).encode("utf-8")
+            with urllib.request.urlopen(urllib.request.Request(url, data=body)) as resp:
+                results = json.loads(resp.read())
+
+            self.assertEqual([r["id"] for r in results], ["t-2x2", "t-2x2-b"])
+            self.assertEqual(results[0]["status"], "solved")
+            self.assertEqual(len(results[0]["grid_solution"]["rows"]), 2)
+
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as resp:
+                text = resp.read().decode("utf-8")
+            self.assertIn('zebra_puzzles_total{size="2*2",status="solved"}', text)
+            self.assertIn('zebra_http_requests_total{code="200"}', text)
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.close()
+
+    def testFullQueueAndTimeout(self):
+        service = SolveService(workers=1, queue_size=1, time_limit=5.0)
+        server = make_server(service, port=0, timeout_s=0.0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            # A list that does not fit is rejected as a whole
+            self.assertRaises(queue.Full, service.submit_all, [{"id": "a"}, {"id": "b"}])
+            self.assertEqual(service.queued(), 0)
+
+            url = f"http://127.0.0.1:{server.server_port}/solve"
+            body = json.dumps({"id": "t", "size": "2*2", "puzzle": "There are 2 houses."}).encode("utf-8")
+            with self.assertRaises(urllib.error.HTTPError) as caught:
+                urllib.request.urlopen(urllib.request.Request(url, data=body))
+            self.assertEqual(caught.exception.code, 504)
+            self.assertIn("error", json.loads(caught.exception.read()))
+
+            with self.assertRaises(urllib.error.HTTPError) as caught:
+                urllib.request.urlopen(urllib.request.Request(url, data=b'[{"id": "a"}, 5]'))
+            self.assertEqual(caught.exception.code, 400)
+            self.assertEqual(service.queued(), 0)
+
+            # Rows for anything else that fails in a worker are built without assuming a dict
+            self.assertEqual(_solve_batch([5])[0][0]["status"], "error")
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.close()
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    argParse = ArgumentParser()
+    argParse.add_argument("--host", type=str, default="127.0.0.1", dest="host")
+    argParse.add_argument("-p", "--port", type=int, default=DEFAULT_PORT, dest="port")
+    argParse.add_argument("-w", "--workers", type=int, default=None, dest="workers", help="Worker processes (default: CPU count).")
+    argParse.add_argument("--batch-size", type=int, default=8, dest="batch_size")
+    argParse.add_argument("--queue-size", type=int, default=256, dest="queue_size", help="Requests that may wait before the server answers 503.")
+    argParse.add_argument("--max-nodes", type=int, default=None, dest="max_nodes")
+    argParse.add_argument("--time-limit", type=float, default=10.0, dest="time_limit")
+    argParse.add_argument("--log-level", type=str, default=None, dest="log_level")
+    argParse.add_argument("--log-json", type=str, default=None, dest="log_json", help="Also write the log as JSON lines to this file.")
+    args = argParse.parse_args()
+    configure_logs(args.log_level, args.log_json)
+
+    serve(args.host, args.port, workers=args.workers, batch_size=args.batch_size, queue_size=args.queue_size,
+          max_nodes=args.max_nodes, time_limit=args.time_limit or None)
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from typing import Dict, List, Optional, Tuple
+
+from metrics import Registry
+from results import ResultWriter, read_rows
+from source import PuzzleSource
+
+# Deterministic sharding for runs split over several processes or machines.
+# A puzzle belongs to shard hash(id) % N with a stable hash, so every shard
+# gets a similar mix of sizes and the split does not depend on the file
+# order or the Python hash seed:
+#
+#   python run.py -gm 1 -f puzzles.parquet --shard 0/4 -o out.csv --metrics m.json   (one per shard)
+#   python shard.py out.csv --shards 4 --metrics m.json -f puzzles.parquet
+#
+# Every shard writes <output>.shard-i-of-N<ext> (and the same for --metrics);
+# the merge combines them into <output> and prints a summary.
+
+Shard = Tuple[int, int]
+
+
+def parse_shard(text: str) -> Shard:
+    """
+    "i/N" -> (i, N) with 0 <= i < N.
+    """
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got {text!r}")
+    if not 0 <= index < count:
+        raise ValueError(f"Shard index must be in 0..{count - 1}, got {index}")
+    return index, count
+
+
+def shard_of(puzzle_id: str, count: int) -> int:
+    digest = hashlib.blake2b(str(puzzle_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+
+def in_shard(puzzle_id: str, shard: Optional[Shard]) -> bool:
+    return shard is None or shard_of(puzzle_id, shard[1]) == shard[0]
+
+
+def shard_path(path: str, shard: Shard) -> str:
+    # out.csv -> out.shard-0-of-4.csv
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard-{shard[0]}-of-{shard[1]}{ext}"
+
+
+def merge(path: str, count: int, metrics_path: Optional[str] = None, source: Optional[str] = None) -> dict:
+    """
+    Combines the results (and metrics snapshots) of shards 0..count-1 into
+    path (and metrics_path). Rows keep the order of the source puzzle file if
+    one is given, else they are sorted by id. Returns a summary dict.
+    """
+    fields: List[str] = []
+    rows: Dict[str, dict] = {}
+    summary = {"shards": count, "rows": 0, "duplicates": [], "missing_shards": [], "status": {}}
+
+    for index in range(count):
+        part = shard_path(path, (index, count))
+        if not os.path.exists(part):
+            summary["missing_shards"].append(index)
+            continue
+        part_fields, part_rows = read_rows(part)
+        fields = fields or part_fields
+        for row in part_rows:
+            if row["id"] in rows:
+                summary["duplicates"].append(row["id"])
+            rows[row["id"]] = row
+
+    if source is not None:
+        order = {pid: pos for pos, pid in enumerate(PuzzleSource(source).index())}
+        ids = sorted(rows, key=lambda pid: (order.get(pid, len(order)), pid))
+    else:
+        ids = sorted(rows)
+
+    with ResultWriter(path, fields or ["id"]) as out:
+        for pid in ids:
+            row = rows[pid]
+            out.write(row)
+            status = row.get("status", row.get("uniqueness"))
+            summary["status"][status] = summary["status"].get(status, 0) + 1
+    summary["rows"] = len(ids)
+
+    if metrics_path is not None:
+        if not metrics_path.endswith(".json"):
+            raise ValueError("Shard metrics can only be merged from .json snapshots")
+        registry = Registry()
+        for index in range(count):
+            part = shard_path(metrics_path, (index, count))
+            if os.path.exists(part):
+                with open(part, encoding="utf-8") as f:
+                    registry.merge(json.load(f))
+        registry.write(metrics_path)
+
+    return summary
+
+
+class ShardTest(unittest.TestCase):
+    TEXT = ("There are 2 houses, numbered 1 to 2 from left to right, as seen from across the street. "
+            "Each house is occupied by a different person. Each house has a unique attribute for each "
+            "of the following characteristics:\n - Each person has a unique name: `Arnold`, `Eric`\n"
+            " - Each person has a favorite color: `red`, `blue`\n\n## Clues:\n"
+            "1. The person who loves red is Arnold.\n2. Eric is in the second house.\n")
+
+    def testStableAndBalanced(self):
+        ids = [f"lgp-test-{h}x{a}-{i}" for h in range(2, 7) for a in range(2, 7) for i in range(40)]
+        counts = [0] * 4
+        for pid in ids:
+            counts[shard_of(pid, 4)] += 1
+        self.assertEqual(sum(counts), len(ids))
+        self.assertLess(max(counts) - min(counts), len(ids) // 10)
+        self.assertEqual(shard_of("lgp-test-5x6-16", 4), shard_of("lgp-test-5x6-16", 4))
+        self.assertEqual(parse_shard("1/3"), (1, 3))
+        self.assertRaises(ValueError, parse_shard, "3/3")
+
+    def testShardProcessesMerge(self):
+        src = os.path.dirname(os.path.abspath(__file__))
+        with tempfile.TemporaryDirectory() as tmp:
+            puzzles = os.path.join(tmp, "puzzles.json")
+            with open(puzzles, "w") as f:
+                json.dump([{"id": f"p{i}", "puzzle": self.TEXT, "size": "2*2"} for i in range(150)], f)
+
+            out, metrics = os.path.join(tmp, "out.csv"), os.path.join(tmp, "metrics.json")
+            procs = [subprocess.Popen([sys.executable, os.path.join(src, "run.py"), "-gm", "1", "-f", puzzles,
+                                       "-j", "1", "--shard", f"{i}/3", "-o", out, "--metrics", metrics],
+                                      cwd=tmp, stdout=subprocess.DEVNULL)
+                     for i in range(3)]
+            self.assertEqual([p.wait() for p in procs], [0, 0, 0])
+
+            # No -n: together the shards cover the whole input, past run.py's default limit
+            summary = merge(out, 3, metrics, source=puzzles)
+            self.assertEqual((summary["rows"], summary["duplicates"], summary["status"]), (150, [], {"solved": 150}))
+            self.assertEqual([row["id"] for row in read_rows(out)[1]], [f"p{i}" for i in range(150)])
+            with open(metrics) as f:
+                solved = json.load(f)["puzzles_total"]["values"]
+            self.assertEqual(solved, [[["2*2", "solved"], 150]])
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    argParse = ArgumentParser(description="Merge the result files of a sharded run")
+    argParse.add_argument("output", type=str, help="The --output path the shards were started with.")
+    argParse.add_argument("--shards", type=int, required=True, dest="shards", help="N of --shard i/N.")
+    argParse.add_argument("--metrics", type=str, default=None, dest="metrics", help="The --metrics path (.json) of the shards.")
+    argParse.add_argument("-f", "--file", type=str, default=None, dest="file", help="Puzzle file, to keep its order in the output.")
+    args = argParse.parse_args()
+
+    summary = merge(args.output, args.shards, args.metrics, args.file)
+    print(json.dumps(summary, indent=1))
+    if summary["missing_shards"]:
+        sys.exit(1)
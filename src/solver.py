@@ -1,12 +1,146 @@
+import time
 import unittest
+from math import factorial
+
+from classes import Constraint, ParsedProblem, Solution, SOLVED, FAILED, TIMEOUT, EMPTY
+from metrics import REGISTRY, Registry, NODE_BUCKETS, size_label
+from constraints import CACHE_LOOKUPS, ValueConstraint, LeftRightConstraint, interchangeable_values, intern_problem, unique_constraints
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised inside the search when the node or time budget of a puzzle runs out.
+    """
+
 
-from classes import ParsedProblem, Solution
 class Solver:
     """
     Complete symbolic CSP solver for ZebraLogicBench-style puzzles.
+    max_nodes / time_limit (seconds) bound the search per puzzle; None = unlimited.
+    metrics: registry for latency, nodes, backtracks and outcomes per puzzle
+    size, None to disable. Published once per solve(), not in the search.
     """
 
+    # The clock is read once every this many nodes
+    TIME_CHECK_INTERVAL = 256
+
+    def __init__(self, max_nodes: int = None, time_limit: float = None, metrics: Registry = REGISTRY):
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.metrics = metrics
+        self.status = SOLVED
+        self.backtracks = 0
+
     def solve(self, problem: ParsedProblem) -> Solution:
+        start = time.perf_counter()
+        self.backtracks = 0
+        solution = self._solve(problem)
+        solution.backtracks = self.backtracks
+        solution.seconds = time.perf_counter() - start
+        if self.metrics is not None:
+            self._publish(problem, solution, solution.seconds)
+        return solution
+
+    def _publish(self, problem: ParsedProblem, solution: Solution, seconds: float):
+        size = size_label(problem.size)
+        m = self.metrics
+        m.counter("puzzles_total", "Solved puzzles by size and status.", ("size", "status")).inc(size=size, status=solution.status)
+        m.histogram("solve_seconds", "Time to solve one puzzle.", ("size",)).observe(seconds, size=size)
+        m.histogram("nodes", "Search nodes per puzzle.", ("size",), NODE_BUCKETS).observe(solution.steps, size=size)
+        m.counter("backtracks_total", "Rejected value placements.", ("size",)).inc(solution.backtracks, size=size)
+
+    def _solve(self, problem: ParsedProblem) -> Solution:
+        # The search runs on symbols, the result is a grid of value indices
+        interned, _ = intern_problem(problem)
+        solution = self._new_solution(interned)
+        self._start_budget()
+        self._break_symmetry(interned)
+        solution.ambiguous = self._multiplicity > 1
+
+        try:
+            for _ in self._backtrack(solution, self._variables(interned), interned.constraints, 0):
+                solution.status = SOLVED
+                return self._compact(solution, problem, interned)
+        except BudgetExceeded:
+            # Anytime fallback: the deepest consistent partial grid seen so far
+            solution.ppl = self._best
+            solution.status = TIMEOUT
+            return self._compact(solution, problem, interned)
+
+        # Exhausted: keep ID and steps so the failure can still be reported
+        solution.status = FAILED
+        return self._compact(solution, problem, interned)
+
+    def count_solutions(self, problem: ParsedProblem, limit: int = 2) -> int:
+        """
+        Counts the solutions of a problem, stopping as soon as `limit` are found.
+        limit=2 is enough to tell a unique puzzle from an ambiguous one.
+        """
+        problem, _ = intern_problem(problem)
+        solution = self._new_solution(problem)
+        self._start_budget()
+        self._break_symmetry(problem)
+        self.status = SOLVED
+        count = 0
+
+        try:
+            for _ in self._backtrack(solution, self._variables(problem), problem.constraints, 0):
+                # Each solution found stands for all orderings of its interchangeable values
+                count += self._multiplicity
+                if count >= limit:
+                    break
+        except BudgetExceeded:
+            self.status = TIMEOUT
+
+        self.steps = solution.steps
+        return min(count, limit)
+
+    def uniqueness(self, problem: ParsedProblem) -> str:
+        """
+        Returns "unique", "multiple" or "none" for the parsed clue set, or
+        "timeout" if the budget ran out before the answer was certain.
+        """
+        count = self.count_solutions(problem, limit=2)
+        if self.status == TIMEOUT:
+            return TIMEOUT
+        return UNIQUENESS[count]
+
+    def _start_budget(self):
+        self._deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        self._best = []
+        self._best_depth = -1
+
+    def _break_symmetry(self, problem: ParsedProblem):
+        """
+        Interchangeable values of a category are only placed in increasing
+        house order, so the search visits one of their k! orderings.
+        """
+        classes = interchangeable_values(problem.entities, problem.constraints)
+        self._previous = {}
+        self._house_of = {}
+        self._multiplicity = 1
+        for category, values in classes.items():
+            for prev, value in zip(values, values[1:]):
+                self._previous[(category, value)] = (category, prev)
+            self._multiplicity *= factorial(len(values))
+
+    def _charge(self, solution, depth):
+        """
+        Books one search node against the budget and remembers the deepest
+        partial assignment for the anytime fallback.
+        """
+        if depth > self._best_depth:
+            self._best_depth = depth
+            self._best = [{"properties": dict(house["properties"])} for house in solution.ppl]
+
+        if self.max_nodes is not None and solution.steps > self.max_nodes:
+            raise BudgetExceeded()
+        if self._deadline is not None and solution.steps % self.TIME_CHECK_INTERVAL == 0 \
+                and time.perf_counter() > self._deadline:
+            raise BudgetExceeded()
+
+    @staticmethod
+    def _new_solution(problem: ParsedProblem) -> Solution:
         width, height = problem.size
         n = width  # number of houses
 
@@ -15,42 +149,62 @@ class Solver:
         solution.steps = 0
         solution.ID = problem.ID
         solution.entities = problem.entities
+        return solution
 
-        entities = list(problem.entities)
-        domains = {entity: set(range(n)) for entity in entities}
+    @staticmethod
+    def _compact(solution: Solution, problem: ParsedProblem, interned: ParsedProblem) -> Solution:
+        """
+        Replaces the symbol grid of the search by value indices into
+        problem.entities; house dicts with names are only built if asked for.
+        """
+        columns = []
+        for category, values in interned.entities.items():
+            index = {}
+            for i, symbol in enumerate(values):
+                index.setdefault(symbol, i)
+            columns.append((category, index))
 
-        success = self._backtrack(
-            solution,
-            entities,
-            domains,
-            problem.constraints,
-            assigned_entities=set()
-        )
+        solution.set_grid([[index.get(props.get(category), EMPTY) for category, index in columns]
+                           for props in (house["properties"] for house in solution.ppl)])
+        solution.entities = problem.entities
+        return solution
 
-        return solution if success else Solution()
+    @staticmethod
+    def _variables(problem: ParsedProblem):
+        # Every value of every category gets a house, e.g. ("colors", "red")
+        return [(category, value) for category, values in problem.entities.items() for value in values]
 
-    def _backtrack(self, solution, entities, domains, constraints, assigned_entities):
-        if len(assigned_entities) == len(entities):
-            return self._check_constraints(solution, constraints)
+    def _backtrack(self, solution, variables, constraints, depth):
+        """
+        Yields every time `solution` holds a complete, consistent assignment.
+        The caller may stop iterating to keep the current assignment.
+        """
+        if depth == len(variables):
+            yield solution
+            return
 
         solution.steps += 1
-        entity = next(e for e in entities if e not in assigned_entities)
+        self._charge(solution, depth)
+        category, value = variables[depth]
+
+        # An interchangeable value goes to the right of the one before it in its class
+        first = self._house_of.get(self._previous.get(variables[depth]), -1) + 1
 
-        for house_idx in domains[entity]:
-            if entity in solution.ppl[house_idx]["properties"].values():
+        for i in range(first, len(solution.ppl)):
+            props = solution.ppl[i]["properties"]
+            # A house holds exactly one value per category
+            if category in props:
                 continue
 
-            solution.ppl[house_idx]["properties"][entity] = entity
-            assigned_entities.add(entity)
+            props[category] = value
+            self._house_of[variables[depth]] = i
 
             if self._check_constraints(solution, constraints):
-                if self._backtrack(solution, entities, domains, constraints, assigned_entities):
-                    return True
-
-            del solution.ppl[house_idx]["properties"][entity]
-            assigned_entities.remove(entity)
+                yield from self._backtrack(solution, variables, constraints, depth + 1)
+            else:
+                self.backtracks += 1
 
-        return False
+            del props[category]
 
     @staticmethod
     def _check_constraints(solution, constraints):
@@ -58,15 +212,87 @@ class Solver:
             if not constraint.isSatisfied(solution):
                 return False
 
-        seen = set()
-        for house in solution.ppl:
-            for value in house["properties"].values():
-                if value in seen:
-                    return False
-                seen.add(value)
-
         return True
 
+
+# count_solutions(limit=2) -> report label
+UNIQUENESS = {0: "none", 1: "unique", 2: "multiple"}
+
+
 class SolverTest(unittest.TestCase):
+    def _problem(self):
+        problem = ParsedProblem("test", 2, 2)
+        problem.entities = {"name": ["alice", "bob"], "color": ["red", "blue"]}
+        return problem
+
     def testSolveBasic(self):
-        pass
+        problem = self._problem()
+        problem.constraints = [ValueConstraint("alice", "blue")]
+        solution = Solver().solve(problem)
+
+        for house in solution.ppl:
+            props = house["properties"]
+            self.assertEqual(props["name"] == "alice", props["color"] == "blue")
+
+    def testUniqueness(self):
+        solver = Solver()
+        problem = self._problem()
+        self.assertEqual(solver.uniqueness(problem), "multiple")
+
+        problem.constraints = [ValueConstraint("alice", "blue"), ValueConstraint("bob", "blue")]
+        self.assertEqual(solver.uniqueness(problem), "none")
+
+        problem.constraints = [ValueConstraint("alice", "blue"), LeftRightConstraint("name", "alice", "name", "bob", "left")]
+        self.assertEqual(solver.uniqueness(problem), "unique")
+
+    def testSymmetryBreaking(self):
+        problem = ParsedProblem("test", 4, 2)
+        problem.entities = {"name": ["alice", "bob", "carol", "dave"], "color": ["red", "blue", "green", "white"]}
+        problem.constraints = [ValueConstraint("alice", "blue")]
+
+        solver = Solver()
+        solution = solver.solve(problem)
+        self.assertEqual(solution.status, "solved")
+        self.assertTrue(solution.ambiguous)
+        # 3 free names and 3 free colors: one of 3! * 3! orderings is searched
+        self.assertEqual(solver.count_solutions(problem, limit=1000), 4 * 3 * 2 * 3 * 2)
+
+        # A constraint type without its own mentions() counts as mentioning all its arguments
+        class Unknown(Constraint):
+            def __init__(self, value1, value2):
+                self.value1, self.value2 = value1, value2
+
+        free = interchangeable_values(problem.entities, [Unknown("bob", "green")])
+        self.assertEqual(free, {"name": ["alice", "carol", "dave"], "color": ["red", "blue", "white"]})
+
+    def testInterning(self):
+        problem = self._problem()
+        problem.constraints = unique_constraints([ValueConstraint("alice", "blue"), ValueConstraint("alice", "blue"),
+                                                  LeftRightConstraint("name", "alice", "name", "bob", "left")])
+        self.assertEqual(len(problem.constraints), 2)
+        self.assertIs(unique_constraints([ValueConstraint("alice", "blue")])[0], problem.constraints[0])
+
+        # Deduplicated per problem; symbol-level constraints stay out of the global table
+        problem.constraints.append(ValueConstraint("alice", "blue"))
+        lookups = sum(CACHE_LOOKUPS.get(cache="constraint", result=r) for r in ("hit", "miss"))
+        interned, symbols = intern_problem(problem)
+        self.assertEqual(len(interned.constraints), 2)
+        self.assertEqual(sum(CACHE_LOOKUPS.get(cache="constraint", result=r) for r in ("hit", "miss")), lookups)
+        self.assertEqual(interned.entities, {"name": [0, 1], "color": [2, 3]})
+        self.assertEqual(vars(interned.constraints[1]), {"key1": "name", "value1": 0, "key2": "name", "value2": 1, "direction": "left"})
+
+        solution = Solver().solve(problem)
+        self.assertEqual(solution.grid, [[0, 1], [1, 0]])
+        self.assertNotIn("ppl", vars(solution))
+        self.assertEqual(solution.rows(), [["alice", "blue"], ["bob", "red"]])
+        self.assertEqual([h["properties"] for h in solution.ppl],
+                         [{"name": "alice", "color": "blue"}, {"name": "bob", "color": "red"}])
+
+    def testNodeBudget(self):
+        problem = self._problem()
+        problem.constraints = [ValueConstraint("alice", "blue"), ValueConstraint("bob", "blue")]
+        solution = Solver(max_nodes=3).solve(problem)
+
+        self.assertEqual(solution.status, "timeout")
+        self.assertEqual(solution.steps, 4)
+        self.assertEqual(sum(len(house["properties"]) for house in solution.ppl), 3)
@@ -0,0 +1,324 @@
+import codecs
+import csv
+import json
+import os
+import re
+import tempfile
+import unittest
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from classes import RawProblem
+
+PARQUET = "parquet"
+JSON = "json"
+CSV = "csv"
+
+CHUNK_SIZE = 1 << 20
+INDEX_SUFFIX = ".idx.json"
+# Batch size when get() decodes a parquet row group up to one row
+ROW_GROUP_ROWS = 64
+
+# The columns to_raw_problem reads
+RAW_COLUMNS = ("id", "puzzle", "size", "question", "choices")
+
+
+class PuzzleSource:
+    """
+    Streams puzzles from a ZebraLogicBench parquet file, a JSON / JSON-lines
+    dump (zebra_puzzles.json) or a CSV file (Test_100_Puzzles.csv) as RawProblem
+    objects. The format is detected from the file content.
+
+    get(id) looks up the position of the puzzle in an index, so a single
+    puzzle is read without loading the whole file. For parquet the index is
+    built from the id column alone and kept in memory; JSON and CSV need a
+    pass over the whole file, so their index is cached in <file>.idx.json.
+    """
+
+    def __init__(self, path: str, limit: Optional[int] = None):
+        self.path = path
+        self.limit = limit
+        self.format = detect_format(path)
+        self._index: Optional[Dict[str, object]] = None
+
+    def __iter__(self) -> Iterator[RawProblem]:
+        for _, row in self._rows():
+            yield to_raw_problem(row)
+
+    def rows(self) -> Iterator[dict]:
+        """
+        The raw records (id, puzzle, size, ... as in the dataset), lazily.
+        """
+        for _, row in self._rows():
+            yield row
+
+    def get(self, puzzle_id: str) -> RawProblem:
+        return to_raw_problem(self.get_row(puzzle_id, columns=RAW_COLUMNS))
+
+    def get_row(self, puzzle_id: str, columns: Optional[Tuple[str, ...]] = None) -> dict:
+        """
+        The raw record of one puzzle. columns limits the parquet columns read,
+        the other formats always return the whole record.
+        """
+        locator = self.index().get(puzzle_id)
+        if locator is None:
+            raise KeyError(f"Puzzle {puzzle_id} not found in {self.path}")
+
+        if self.format == PARQUET:
+            return _read_parquet_row(self.path, *locator, columns=columns)
+        if self.format == JSON:
+            return next(_iter_json(self.path, start=locator))[1]
+        return next(_iter_csv(self.path, start=locator))[1]
+
+    def index(self) -> Dict[str, object]:
+        """
+        id -> position in the file. Built with one pass over the ids; for JSON
+        and CSV cached next to the file until the file changes.
+        """
+        if self._index is not None:
+            return self._index
+        if self.format == PARQUET:
+            self._index = _index_parquet(self.path)
+            return self._index
+
+        stat = os.stat(self.path)
+        stamp = [stat.st_size, stat.st_mtime_ns]
+        index_path = self.path + INDEX_SUFFIX
+
+        try:
+            with open(index_path, "r") as f:
+                cached = json.load(f)
+            if cached.get("stamp") == stamp:
+                self._index = cached["ids"]
+                return self._index
+        except (OSError, ValueError):
+            pass
+
+        rows = _iter_json(self.path) if self.format == JSON else _iter_csv(self.path)
+        self._index = {str(row["id"]): pos for pos, row in rows}
+
+        try:
+            with open(index_path, "w") as f:
+                json.dump({"stamp": stamp, "format": self.format, "ids": self._index}, f)
+        except OSError:
+            # Read-only dataset directory: keep the index in memory only
+            pass
+
+        return self._index
+
+    def _rows(self):
+        if self.format == PARQUET:
+            rows = _iter_parquet(self.path)
+        elif self.format == JSON:
+            rows = _iter_json(self.path)
+        else:
+            rows = _iter_csv(self.path)
+
+        for count, item in enumerate(rows):
+            if self.limit is not None and count >= self.limit:
+                break
+            yield item
+
+
+def detect_format(path: str) -> str:
+    with open(path, "rb") as f:
+        head = f.read(512)
+
+    if head.startswith(b"PAR1"):
+        return PARQUET
+    if head.lstrip().startswith((b"[", b"{")):
+        return JSON
+    return CSV
+
+
+def to_raw_problem(row: dict) -> RawProblem:
+    text = normalise_puzzle_text(row.get("puzzle", ""))
+    if "question" in row:
+        return RawProblem(row["id"], text, question=row["question"], choiches=row.get("choices", ""))
+    return RawProblem(row["id"], text, size=row.get("size", ""))
+
+
+def normalise_puzzle_text(text: str) -> str:
+    """
+    Rewrites the plain CSV format ("Colors: red, blue." ... "Clues:") into the
+    ZebraLogicBench layout (" - Colors: `red`, `blue`" ... "## Clues:") that the
+    parsers read. Text that already has a "## Clues:" section is returned as is.
+    """
+    if "## Clues" in text or not re.search(r"^Clues:", text, re.M):
+        return text
+
+    lines = []
+    in_clues = False
+    for line in text.split("\n"):
+        if line.strip() == "Clues:":
+            in_clues = True
+            lines.append("## Clues:")
+            continue
+
+        match = None if in_clues else re.match(r"^([A-Z][\w ]*): (.+?)\.?$", line.strip())
+        if match:
+            values = ", ".join(f"`{v.strip()}`" for v in match.group(2).split(","))
+            line = f" - {match.group(1)}: {values}"
+        lines.append(line)
+
+    return "\n".join(lines)
+
+
+# --- Parquet ---
+
+def _iter_parquet(path: str):
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    for group in range(pf.num_row_groups):
+        row_idx = 0
+        for batch in pf.iter_batches(batch_size=256, row_groups=[group]):
+            for row in batch.to_pylist():
+                yield [group, row_idx], row
+                row_idx += 1
+
+
+def _index_parquet(path: str) -> dict:
+    """
+    id -> [row group, row], reading nothing but the id column.
+    """
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    index = {}
+    for group in range(pf.num_row_groups):
+        ids = pf.read_row_group(group, columns=["id"]).column("id").to_pylist()
+        for row_idx, puzzle_id in enumerate(ids):
+            index[puzzle_id] = [group, row_idx]
+    return index
+
+
+def _read_parquet_row(path: str, group: int, row_idx: int, columns: Optional[Tuple[str, ...]] = None) -> dict:
+    """
+    Decodes the row group batch by batch and stops at the batch holding the row.
+    """
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    if columns is not None:
+        columns = [c for c in columns if c in pf.schema_arrow.names]
+    seen = 0
+    for batch in pf.iter_batches(batch_size=ROW_GROUP_ROWS, row_groups=[group], columns=columns):
+        if row_idx < seen + batch.num_rows:
+            return batch.slice(row_idx - seen, 1).to_pylist()[0]
+        seen += batch.num_rows
+    raise KeyError(f"Row {row_idx} of row group {group} not found in {path}")
+
+
+# --- JSON array / JSON lines ---
+
+_SEPARATORS = re.compile(r"[ \t\r\n,\[\]]*")
+
+def _iter_json(path: str, start: int = 0):
+    """
+    Yields (byte offset, object) for every top-level object of a JSON array or
+    a JSON-lines file, decoding the file chunk by chunk.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+
+    with open(path, "rb") as f:
+        f.seek(start)
+        pos = start  # byte offset of buf[i]
+        buf = ""
+        i = 0  # cursor into buf; the consumed text is only dropped when a chunk is read
+        eof = False
+
+        while True:
+            # Skip the array brackets and separators between objects
+            skip = _SEPARATORS.match(buf, i).end()
+            if skip > i:
+                pos += len(buf[i:skip].encode("utf-8"))
+                i = skip
+
+            if i < len(buf):
+                try:
+                    obj, end = decoder.raw_decode(buf, i)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    yield pos, obj
+                    pos += len(buf[i:end].encode("utf-8"))
+                    i = end
+                    continue
+            elif eof:
+                return
+
+            chunk = f.read(CHUNK_SIZE)
+            eof = not chunk
+            buf = buf[i:] + utf8.decode(chunk, final=eof)
+            i = 0
+
+
+# --- CSV ---
+
+class _TrackedLines:
+    """
+    Line iterator for csv.reader that remembers how many bytes were consumed.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.pos = f.tell()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        self.pos += len(line)
+        return line.decode("utf-8")
+
+
+def _iter_csv(path: str, start: int = 0):
+    """
+    Yields (byte offset, row dict). Puzzle texts span several lines, so the
+    offset is taken before csv.reader pulls the first line of a record.
+    """
+    with open(path, "rb") as f:
+        lines = _TrackedLines(f)
+        reader = csv.reader(lines)
+        header = [h.strip() for h in next(reader)]
+
+        if start:
+            f.seek(start)
+            lines.pos = start
+
+        while True:
+            pos = lines.pos
+            try:
+                values = next(reader)
+            except StopIteration:
+                return
+            if values:
+                yield pos, dict(zip(header, values))
+
+
+class PuzzleSourceTest(unittest.TestCase):
+    def testGetByIndex(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        rows = [{"id": f"p{i}", "puzzle": f"text {i}", "size": "2*2"} for i in range(150)]
+        with tempfile.TemporaryDirectory() as tmp:
+            parquet = os.path.join(tmp, "puzzles.parquet")
+            pq.write_table(pa.Table.from_pylist(rows), parquet, row_group_size=1000)
+            jsonl = os.path.join(tmp, "puzzles.jsonl")
+            with open(jsonl, "w", encoding="utf-8") as f:
+                f.write("".join(json.dumps(r) + "\n" for r in rows))
+
+            for path in (parquet, jsonl):
+                for _ in range(2):  # built, then cached
+                    source = PuzzleSource(path)
+                    self.assertEqual(list(source.index()), [r["id"] for r in rows])
+                    self.assertEqual([source.get_row(f"p{i}") for i in (0, 64, 149)], [rows[0], rows[64], rows[149]])
+            # Nothing but the JSON index is written next to the inputs
+            self.assertEqual(sorted(os.listdir(tmp)), ["puzzles.jsonl", "puzzles.jsonl" + INDEX_SUFFIX, "puzzles.parquet"])
+            self.assertEqual(PuzzleSource(parquet).get("p70").text, "text 70")
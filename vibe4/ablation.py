@@ -0,0 +1,196 @@
+import multiprocessing
+import sys
+import time
+
+from parser import PuzzleParser
+from session import SolverSession
+from solver import TIMEOUT
+from shared import PuzzleSource, ResultWriter, configure_logs, get_logger
+
+# Clue ablation for dataset QA. Per puzzle, against the ground-truth grid of
+# the dataset's `solution` column:
+# - violations: clues whose parsed constraints the true grid breaks (mis-parsed)
+# - core: a minimal set of clues without any solution (deletion filter)
+# - minimal: a minimal set of clues whose only solution is the true grid
+# The implicit AllDiff constraints (clue 0) are always kept.
+
+ABLATION_FILE = "ablation.jsonl"
+NODE_BUDGET = 20000
+
+OK = "ok"                     # parsed clues determine the true grid
+UNSAT = "unsat"               # parsed clues have no solution at all
+WRONG = "wrong"               # some parsed clue contradicts the true grid
+UNDERDETERMINED = "underdetermined"  # true grid is a solution, but not the only one
+NO_TRUTH = "no_truth"         # no usable solution grid in the dataset row
+ERROR = "error"
+
+log = get_logger("vibe4.ablation")
+
+
+def truth_assignment(solution, variables):
+    """
+    variable -> house from a dataset solution grid {"header": [...], "rows": [[house, value, ...], ...]},
+    or None if the grid does not name every variable (e.g. the blanked test set).
+    """
+    if not solution or not solution.get("rows"):
+        return None
+    names = {v.lower(): v for v in variables}
+    truth = {}
+    for h, row in enumerate(solution["rows"], 1):
+        for cell in list(row)[1:]:
+            var = names.get(str(cell).replace(" ", "_").lower())
+            if var is not None:
+                truth[var] = h
+    return truth if len(truth) == len(variables) else None
+
+
+class ClueOracle:
+    """
+    Answers "how many solutions (up to 2) does this clue set have?" with an
+    incremental SolverSession, caching every answer. Solution counts only
+    shrink when clues are added, so known answers also decide supersets
+    (0 solutions) and subsets (2 solutions) without a search.
+    """
+
+    def __init__(self, session, clues):
+        self.session = session
+        self.active = set(clues)
+        self.removed = {}  # clue -> its constraints, while removed from the session
+        self.cache = {}
+        self.searches = 0
+        self.steps = 0
+        self._unsat = []
+        self._multiple = []
+
+    def count(self, clues):
+        """
+        0, 1 or 2 (= at least two) solutions, None if the budget ran out.
+        """
+        clues = frozenset(clues)
+        if clues in self.cache:
+            return self.cache[clues]
+        if any(core <= clues for core in self._unsat):
+            return 0
+        if any(clues <= wide for wide in self._multiple):
+            return 2
+
+        self._select(clues)
+        count = self.session.count_solutions(limit=2)
+        self.searches += 1
+        self.steps += self.session.steps
+        if self.session.status == TIMEOUT:
+            count = None
+        elif count == 0:
+            self._unsat.append(clues)
+        elif count == 2:
+            self._multiple.append(clues)
+        self.cache[clues] = count
+        return count
+
+    def _select(self, clues):
+        # Toggle only the clues that differ from the session's current set
+        for clue in self.active - clues:
+            self.removed[clue] = self.session.remove_clue(clue)
+        for clue in clues - self.active:
+            self.session.add_clue(self.removed.pop(clue))
+        self.active = set(clues)
+
+
+def deletion_filter(clues, keep):
+    """
+    Drops clues one by one while keep(remaining) stays true; the result is
+    minimal: removing any single clue breaks keep.
+    """
+    current = list(clues)
+    for clue in list(current):
+        trial = [c for c in current if c != clue]
+        if keep(trial):
+            current = trial
+    return current
+
+
+def analyse(puzzle_id, parser, solution, max_nodes=NODE_BUDGET):
+    """
+    Returns the ablation report of one puzzle as a dict.
+    """
+    variables, domains, constraints, _ = parser.parse()
+    clues = sorted({clue for _, _, clue in constraints if clue > 0})
+    report = {"id": puzzle_id, "clues": len(clues), "status": None,
+              "violations": [], "core": [], "minimal": [], "searches": 0, "steps": 0}
+
+    duplicates = sorted({v for v in variables if variables.count(v) > 1})
+    if duplicates:
+        # One name in two attributes is one variable for the parser, the solver cannot place it twice
+        report.update(status=ERROR, error=f"value names in several attributes: {', '.join(duplicates)}")
+        return report
+
+    truth = truth_assignment(solution, variables)
+    if truth is not None:
+        report["violations"] = sorted({clue for func, scope, clue in constraints
+                                       if clue > 0 and not func(*[truth[v] for v in scope])})
+
+    oracle = ClueOracle(SolverSession(variables, domains, constraints, max_nodes=max_nodes), clues)
+    full = oracle.count(clues)
+
+    if full == 0:
+        report["status"] = UNSAT
+        report["core"] = deletion_filter(clues, lambda subset: oracle.count(subset) == 0)
+    elif truth is None:
+        report["status"] = NO_TRUTH
+    elif report["violations"]:
+        report["status"] = WRONG
+    elif full == 1:
+        # Every clue holds on the true grid, so a unique solution is the true grid
+        report["status"] = OK
+        report["minimal"] = deletion_filter(clues, lambda subset: oracle.count(subset) == 1)
+    elif full == 2:
+        report["status"] = UNDERDETERMINED
+    else:
+        report["status"] = TIMEOUT
+
+    report["searches"], report["steps"] = oracle.searches, oracle.steps
+    return report
+
+
+def _analyse_row(row):
+    parser = PuzzleParser({"id": row["id"], "puzzle": row["puzzle"], "size": row.get("size", "")})
+    try:
+        return analyse(row["id"], parser, row.get("solution"))
+    except Exception as e:
+        return {"id": row["id"], "status": ERROR, "error": str(e)}
+
+
+def run(path, limit=None, jobs=None, out_path=ABLATION_FILE, resume=True):
+    """
+    Analyses every puzzle of `path` in `jobs` processes, appending one JSON
+    line per puzzle to out_path. With resume, puzzles already in the file
+    (from an interrupted run) are skipped.
+    """
+    counts = {}
+    with ResultWriter(out_path, resume=resume) as out:
+        rows = (row for row in PuzzleSource(path, limit=limit).rows() if row["id"] not in out.done)
+        with multiprocessing.Pool(jobs) as pool:
+            for report in pool.imap_unordered(_analyse_row, rows, chunksize=4):
+                counts[report["status"]] = counts.get(report["status"], 0) + 1
+                log.info("%s: %s %s", report["id"], report["status"],
+                         report.get("core") or report.get("violations") or report.get("minimal") or "")
+                out.write(report)
+    return counts
+
+
+if __name__ == "__main__":
+    # python ablation.py [puzzles] [limit] [-j jobs]
+    args = sys.argv[1:]
+    jobs = None
+    if "-j" in args:
+        i = args.index("-j")
+        jobs = int(args[i + 1])
+        args = args[:i] + args[i + 2:]
+    path = args[0] if args else "../Gridmode-00000-of-00001.parquet"
+    limit = int(args[1]) if len(args) > 1 else None
+
+    configure_logs("INFO")
+    start = time.perf_counter()
+    counts = run(path, limit, jobs)
+    print(f"\n📊 {sum(counts.values())} puzzles in {time.perf_counter() - start:.1f}s: {counts}")
+    print(f"Reports saved to '{ABLATION_FILE}'.")
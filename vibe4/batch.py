@@ -0,0 +1,272 @@
+import os
+import unittest
+
+import numpy as np
+
+from solver import CSPSolver, SOLVED, FAILED
+from relations import (to_constraint, EQ, NEQ, NEXT_TO, LEFT_OF, RIGHT_OF, BEFORE, AFTER, GAP, AT,
+                       NOT_NEXT_TO, NOT_LEFT_OF, NOT_RIGHT_OF, NOT_BEFORE, NOT_AFTER, BETWEEN, END, NOT_AT)
+
+# Batch propagation over the constraint IR. All puzzles with the same number
+# of houses are packed into one candidate tensor
+#   cand[p, v, h] = house h (0-based) is still possible for variable v of puzzle p
+# and every rule below narrows the candidates of all matching records of all
+# puzzles in one NumPy operation, until nothing changes. Puzzles that end with
+# one house per variable are solved, an empty domain proves there is no
+# solution, the rest go to CSPSolver with the narrowed domains.
+
+MAX_ROUNDS = 100
+
+
+def _shift(x, d):
+    """
+    out[:, h] = x[:, h - d], False where h - d is outside the street.
+    """
+    out = np.zeros_like(x)
+    if d > 0:
+        out[:, d:] = x[:, :-d]
+    elif d < 0:
+        out[:, :d] = x[:, -d:]
+    else:
+        out[:] = x
+    return out
+
+
+def _before(x):
+    # out[:, h] = x has a candidate at some house <= h
+    return np.logical_or.accumulate(x, axis=1)
+
+
+def _after(x):
+    # out[:, h] = x has a candidate at some house >= h
+    return np.logical_or.accumulate(x[:, ::-1], axis=1)[:, ::-1]
+
+
+def _support(kind, A, B, fixed_a, fixed_b):
+    """
+    Houses of a that still have a partner in B, and houses of b that still
+    have a partner in A, for binary records of one kind. A, B: (R, H) bool.
+    """
+    if kind == EQ:
+        return B, A
+    if kind == NEXT_TO:
+        return _shift(B, 1) | _shift(B, -1), _shift(A, 1) | _shift(A, -1)
+    if kind == LEFT_OF:      # a == b - 1
+        return _shift(B, -1), _shift(A, 1)
+    if kind == RIGHT_OF:     # a == b + 1
+        return _shift(B, 1), _shift(A, -1)
+    if kind == BEFORE:       # a < b
+        return _shift(_after(B), -1), _shift(_before(A), 1)
+    if kind == AFTER:        # a > b
+        return _shift(_before(B), 1), _shift(_after(A), -1)
+    if kind == NOT_BEFORE:   # a >= b
+        return _before(B), _after(A)
+    if kind == NOT_AFTER:    # a <= b
+        return _after(B), _before(A)
+
+    # Negative relations only prune once the other side is fixed
+    fa, fb = fixed_a[:, None], fixed_b[:, None]
+    if kind == NEQ:
+        return ~(B & fb), ~(A & fa)
+    if kind == NOT_NEXT_TO:
+        return ~((_shift(B, 1) | _shift(B, -1)) & fb), ~((_shift(A, 1) | _shift(A, -1)) & fa)
+    if kind == NOT_LEFT_OF:  # a != b - 1
+        return ~(_shift(B, -1) & fb), ~(_shift(A, 1) & fa)
+    if kind == NOT_RIGHT_OF: # a != b + 1
+        return ~(_shift(B, 1) & fb), ~(_shift(A, -1) & fa)
+    raise ValueError(f"No batch rule for constraint kind {kind}")
+
+
+BINARY_KINDS = (EQ, NEQ, NEXT_TO, LEFT_OF, RIGHT_OF, BEFORE, AFTER,
+                NOT_NEXT_TO, NOT_LEFT_OF, NOT_RIGHT_OF, NOT_BEFORE, NOT_AFTER)
+
+
+class Batch:
+    """
+    The candidate tensor of a set of puzzles with the same number of houses.
+    puzzles: (variables, groups, records, num_houses) per puzzle, as produced
+    by PuzzleParser or CompiledPuzzle.
+    """
+
+    def __init__(self, puzzles, houses):
+        self.houses = houses
+        n, width = len(puzzles), max(len(p[0]) for p in puzzles)
+        n_groups = max(len(p[1]) for p in puzzles)
+
+        self.valid = np.zeros((n, width), dtype=bool)
+        self.group = np.zeros((n, width, n_groups), dtype=bool)
+        records = []
+        for i, (variables, groups, recs, _) in enumerate(puzzles):
+            self.valid[i, :len(variables)] = True
+            pos = 0
+            for g, members in enumerate(groups):
+                self.group[i, pos:pos + len(members), g] = True
+                pos += len(members)
+            recs = np.asarray(recs, dtype=np.int64).reshape(-1, 6)
+            records.append(np.column_stack([np.full(len(recs), i), recs]))
+
+        # (puzzle, kind, clue, a, b, c, arg); implicit AllDiff records are
+        # handled by the group rules below
+        records = np.concatenate(records)
+        records = records[~((records[:, 1] == NEQ) & (records[:, 2] == 0))]
+        self.records = {kind: records[records[:, 1] == kind] for kind in np.unique(records[:, 1])}
+        self.full_groups = self.group.sum(axis=1) == houses  # (n, G) groups with one value per house
+
+        self.cand = np.repeat(self.valid[:, :, None], houses, axis=2)
+        self._apply_unary()
+
+    def _apply_unary(self):
+        house = np.arange(1, self.houses + 1)
+        for kind in (AT, NOT_AT, END):
+            recs = self.records.get(kind)
+            if recs is None:
+                continue
+            p, a, arg = recs[:, 0], recs[:, 3], recs[:, 6][:, None]
+            if kind == AT:
+                allowed = house == arg
+            elif kind == NOT_AT:
+                allowed = house != arg
+            else:
+                allowed = (house == 1) | (house == arg)
+            np.logical_and.at(self.cand, (p, a), allowed)
+
+    def _apply_binary(self):
+        fixed = self.cand.sum(axis=2) == 1
+        for kind in BINARY_KINDS:
+            recs = self.records.get(kind)
+            if recs is None:
+                continue
+            p, a, b = recs[:, 0], recs[:, 3], recs[:, 4]
+            sa, sb = _support(kind, self.cand[p, a], self.cand[p, b], fixed[p, a], fixed[p, b])
+            # .at: a variable can appear in several records of the same kind
+            np.logical_and.at(self.cand, (p, a), sa)
+            np.logical_and.at(self.cand, (p, b), sb)
+
+        recs = self.records.get(GAP)
+        if recs is not None:
+            # |a - b| == arg, one pass per distance
+            for d in np.unique(recs[:, 6]):
+                sub = recs[recs[:, 6] == d]
+                p, a, b = sub[:, 0], sub[:, 3], sub[:, 4]
+                A, B = self.cand[p, a], self.cand[p, b]
+                np.logical_and.at(self.cand, (p, a), _shift(B, d) | _shift(B, -d))
+                np.logical_and.at(self.cand, (p, b), _shift(A, d) | _shift(A, -d))
+
+        recs = self.records.get(BETWEEN)
+        if recs is not None:
+            p, a, b, c = recs[:, 0], recs[:, 3], recs[:, 4], recs[:, 5]
+            B, C = self.cand[p, b], self.cand[p, c]
+            left_b, right_b = _shift(_before(B), 1), _shift(_after(B), -1)
+            left_c, right_c = _shift(_before(C), 1), _shift(_after(C), -1)
+            np.logical_and.at(self.cand, (p, a), (left_b & right_c) | (left_c & right_b))
+
+    def _apply_groups(self):
+        """
+        AllDiff per group: a fixed value takes its house from the rest of the
+        group, and a house only one value can take goes to that value.
+        """
+        cand = self.cand
+        single = cand & (cand.sum(axis=2, keepdims=True) == 1)
+        taken = np.einsum("pvg,pvh->pgh", self.group, single, dtype=np.int32) > 0
+        blocked = np.einsum("pvg,pgh->pvh", self.group, taken, dtype=np.int32) > 0
+        cand &= ~(blocked & ~single)
+
+        count = np.einsum("pvg,pvh->pgh", self.group, cand, dtype=np.int32)
+        only = (count == 1) & self.full_groups[:, :, None]
+        hidden = (np.einsum("pvg,pgh->pvh", self.group, only, dtype=np.int32) > 0) & cand
+        has_hidden = hidden.any(axis=2, keepdims=True)
+        cand &= np.where(has_hidden, hidden, True)
+
+    def propagate(self, max_rounds=MAX_ROUNDS):
+        for _ in range(max_rounds):
+            before = self.cand.copy()
+            self._apply_binary()
+            self._apply_groups()
+            if np.array_equal(before, self.cand):
+                break
+        return self
+
+    def states(self):
+        """
+        Per puzzle: SOLVED (one house per variable), FAILED (an empty domain)
+        or None (search needed).
+        """
+        size = self.cand.sum(axis=2)
+        empty = ((size == 0) & self.valid).any(axis=1)
+        done = ((size == 1) | ~self.valid).all(axis=1)
+        return [FAILED if e else SOLVED if d else None for e, d in zip(empty, done)]
+
+    def domains(self, i, variables):
+        houses = np.arange(1, self.houses + 1)
+        return {v: houses[self.cand[i, k]].tolist() for k, v in enumerate(variables)}
+
+
+def solve_all(puzzles, max_nodes=None, time_limit=None):
+    """
+    Solves many puzzles: batch propagation per house count, then CSPSolver for
+    the puzzles propagation did not finish.
+    puzzles: list of (variables, groups, records, num_houses)
+    Yields (index into puzzles, (assignment, status, steps)) as each puzzle is
+    done, one size group after the other; steps = search nodes, None for the
+    puzzles propagation decided on its own (rounds are shared by the batch).
+    """
+    by_size = {}
+    for i, puzzle in enumerate(puzzles):
+        by_size.setdefault(puzzle[3], []).append(i)
+
+    for houses, indices in by_size.items():
+        batch = Batch([puzzles[i] for i in indices], houses).propagate()
+        for j, (i, state) in enumerate(zip(indices, batch.states())):
+            variables, groups, records, _ = puzzles[i]
+            domains = batch.domains(j, variables)
+            constraints = [to_constraint(r, variables) for r in records]
+
+            if state == FAILED:
+                yield i, ({}, FAILED, None)
+                continue
+
+            if state == SOLVED:
+                assignment = {v: d[0] for v, d in domains.items()}
+                if all(func(*[assignment[v] for v in scope]) for func, scope, _ in constraints):
+                    yield i, (assignment, SOLVED, None)
+                    continue
+
+            try:
+                solver = CSPSolver(variables, domains, max_nodes=max_nodes, time_limit=time_limit)
+                for func, scope, clue in constraints:
+                    solver.add_constraint(func, scope, clue)
+                assignment = solver.solve()
+                outcome = (assignment or {}, solver.status, solver.steps)
+            except Exception:
+                # Same as run.py: e.g. a value listed twice in one puzzle
+                outcome = ({}, "error", 0)
+            yield i, outcome
+
+
+class BatchTest(unittest.TestCase):
+    def testMatchesSearch(self):
+        from parser import PuzzleParser
+        from shared import PuzzleSource
+
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zebra_puzzles.json")
+        parsers = [PuzzleParser.from_raw(raw) for raw in PuzzleSource(path, limit=40)]
+        csps = [parser.parse() for parser in parsers]
+        outcomes = dict(solve_all([(variables, groups, parser.records, parser.num_houses)
+                                   for parser, (variables, domains, constraints, groups) in zip(parsers, csps)]))
+
+        decided = 0
+        for i, (variables, domains, constraints, groups) in enumerate(csps):
+            solver = CSPSolver(variables, domains)
+            for func, scope, clue in constraints:
+                solver.add_constraint(func, scope, clue)
+            expected = solver.solve()
+
+            assignment, status, steps = outcomes[i]
+            self.assertEqual(status, solver.status, i)
+            if status == SOLVED:
+                self.assertTrue(all(func(*[assignment[v] for v in scope]) for func, scope, _ in constraints))
+                if solver.uniqueness() == "unique":
+                    self.assertEqual(assignment, expected)
+            decided += steps is None
+        # Propagation alone settles some of them, without a search step count
+        self.assertGreater(decided, 0)
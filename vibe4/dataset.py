@@ -0,0 +1,259 @@
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from parser import PuzzleParser
+from shared import PuzzleSource
+from relations import RECORD_WIDTH, to_constraint
+
+# --- Binary layout of a compiled dataset ---
+# header: magic + section offsets/counts (little-endian int64)
+# puzzles: (n, PUZZLE_WIDTH) int32, one row per puzzle, see PUZZLE_FIELDS
+# groups:  int32 group sizes; a puzzle's variables are its groups back to back
+# vars:    int32 string ids of the variables
+# records: (m, RECORD_WIDTH) int32 constraint IR, see relations.py
+# clues:   (k, 2) int32 (clue number, string id of the clue text)
+# strings: int64 offsets (s + 1) into a UTF-8 blob, shared by all puzzles
+
+MAGIC = b"ZEBRAIR1"
+HEADER_FIELDS = (
+    "n_puzzles", "puzzles", "n_groups", "groups", "n_vars", "vars",
+    "n_records", "records", "n_clues", "clues", "n_strings", "strings",
+    "blob_len", "blob",
+)
+HEADER = struct.Struct("<8s" + "q" * len(HEADER_FIELDS))
+
+PUZZLE_FIELDS = (
+    "id", "houses", "var_start", "var_count", "group_start", "group_count",
+    "rec_start", "rec_count", "clue_start", "clue_count",
+)
+PUZZLE_WIDTH = len(PUZZLE_FIELDS)
+(ID, HOUSES, VAR_START, VAR_COUNT, GROUP_START, GROUP_COUNT,
+ REC_START, REC_COUNT, CLUE_START, CLUE_COUNT) = range(PUZZLE_WIDTH)
+
+
+def compile_dataset(puzzles, path):
+    """
+    Parses every puzzle once and writes the result as one binary file.
+    puzzles: puzzle dicts or RawProblems (e.g. from a PuzzleSource)
+    Returns the number of puzzles written.
+    """
+    strings = {}
+    puzzle_rows, group_sizes, var_ids, records, clues = [], [], [], [], []
+
+    def intern(s):
+        return strings.setdefault(s, len(strings))
+
+    for idx, puzzle_data in enumerate(puzzles):
+        if isinstance(puzzle_data, dict):
+            pid = puzzle_data.get("id", idx)
+            parser = PuzzleParser(puzzle_data)
+        else:
+            pid = puzzle_data.ID
+            parser = PuzzleParser.from_raw(puzzle_data)
+        variables, domains, constraints, groups = parser.parse()
+
+        puzzle_rows.append((
+            intern(str(pid)), parser.num_houses,
+            len(var_ids), len(variables), len(group_sizes), len(groups),
+            len(records), len(parser.records), len(clues), len(parser.clues),
+        ))
+        group_sizes.extend(len(g) for g in groups)
+        var_ids.extend(intern(v) for v in variables)
+        records.extend(parser.records)
+        clues.extend((no, intern(text)) for no, text in parser.clues.items())
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+    sections = [
+        np.asarray(puzzle_rows, dtype="<i4").reshape(-1, PUZZLE_WIDTH),
+        np.asarray(group_sizes, dtype="<i4"),
+        np.asarray(var_ids, dtype="<i4"),
+        np.asarray(records, dtype="<i4").reshape(-1, RECORD_WIDTH),
+        np.asarray(clues, dtype="<i4").reshape(-1, 2),
+        offsets,
+        np.frombuffer(b"".join(encoded), dtype=np.uint8),
+    ]
+    counts = [len(puzzle_rows), len(group_sizes), len(var_ids), len(records), len(clues), len(encoded), int(offsets[-1])]
+
+    with open(path, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+        header = []
+        for count, array in zip(counts, sections):
+            # Keep every section 8-byte aligned so the views need no copy
+            f.write(b"\0" * (-f.tell() % 8))
+            header += [count, f.tell()]
+            f.write(array.tobytes())
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, *header))
+
+    return len(puzzle_rows)
+
+
+class CompiledDataset:
+    """
+    Read-only view of a compiled dataset. The file is mmap-ed and every table
+    is a NumPy view on the mapping, so pool workers opening the same file share
+    the pages and any puzzle can be fetched in O(1).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, *values = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled puzzle dataset")
+        h = dict(zip(HEADER_FIELDS, values))
+
+        self.puzzles = self._view(h["puzzles"], "<i4", h["n_puzzles"] * PUZZLE_WIDTH).reshape(-1, PUZZLE_WIDTH)
+        self.groups = self._view(h["groups"], "<i4", h["n_groups"])
+        self.vars = self._view(h["vars"], "<i4", h["n_vars"])
+        self.records = self._view(h["records"], "<i4", h["n_records"] * RECORD_WIDTH).reshape(-1, RECORD_WIDTH)
+        self.clues = self._view(h["clues"], "<i4", h["n_clues"] * 2).reshape(-1, 2)
+        self.offsets = self._view(h["strings"], "<i8", h["n_strings"] + 1)
+        self.blob = h["blob"]
+        self._ids = None
+
+    def _view(self, offset, dtype, count):
+        return np.frombuffer(self._mm, dtype=dtype, count=count, offset=offset)
+
+    def string(self, sid):
+        start, end = self.offsets[sid], self.offsets[sid + 1]
+        return self._mm[self.blob + start:self.blob + end].decode("utf-8")
+
+    def __len__(self):
+        return len(self.puzzles)
+
+    def __getitem__(self, i):
+        return CompiledPuzzle(self, int(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield CompiledPuzzle(self, i)
+
+    def index(self, puzzle_id):
+        """
+        Row of a puzzle id. The id table is decoded once, on first use.
+        """
+        if self._ids is None:
+            self._ids = {self.string(sid): row for row, sid in enumerate(self.puzzles[:, ID])}
+        return self._ids[puzzle_id]
+
+    def get(self, puzzle_id):
+        return self[self.index(puzzle_id)]
+
+    def close(self):
+        # The NumPy views pin the mapping, drop them before closing it
+        self.puzzles = self.groups = self.vars = self.records = self.clues = self.offsets = None
+        try:
+            self._mm.close()
+        except BufferError:
+            # Puzzles handed out still view the mapping; it goes away with them
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Workers receive the path and map the file themselves
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+
+class CompiledPuzzle:
+    """
+    One puzzle of a CompiledDataset. Offers the same parse()/clues interface as
+    PuzzleParser, so callers can use either.
+    """
+
+    def __init__(self, dataset, row):
+        self.dataset = dataset
+        self.row = dataset.puzzles[row]
+        self.id = dataset.string(self.row[ID])
+        self.num_houses = int(self.row[HOUSES])
+
+    @property
+    def records(self):
+        start = self.row[REC_START]
+        return self.dataset.records[start:start + self.row[REC_COUNT]]
+
+    @property
+    def variables(self):
+        start = self.row[VAR_START]
+        return [self.dataset.string(sid) for sid in self.dataset.vars[start:start + self.row[VAR_COUNT]]]
+
+    @property
+    def clues(self):
+        start = self.row[CLUE_START]
+        rows = self.dataset.clues[start:start + self.row[CLUE_COUNT]]
+        return {int(no): self.dataset.string(sid) for no, sid in rows}
+
+    def parse(self):
+        variables = self.variables
+
+        start = self.row[GROUP_START]
+        groups, pos = [], 0
+        for size in self.dataset.groups[start:start + self.row[GROUP_COUNT]]:
+            groups.append(variables[pos:pos + size])
+            pos += size
+
+        house_domain = list(range(1, self.num_houses + 1))
+        domains = {var: house_domain for var in variables}
+        constraints = [to_constraint(record, variables) for record in self.records]
+
+        return variables, domains, constraints, groups
+
+
+class CompiledDatasetTest(unittest.TestCase):
+    def testRoundTrip(self):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zebra_puzzles.json")
+        raws = list(PuzzleSource(path, limit=20))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            compiled = os.path.join(tmp, "puzzles.bin")
+            self.assertEqual(compile_dataset(raws, compiled), len(raws))
+
+            with CompiledDataset(compiled) as dataset:
+                self.assertEqual(len(dataset), len(raws))
+                for raw, puzzle in zip(raws, dataset):
+                    parser = PuzzleParser.from_raw(raw)
+                    variables, domains, constraints, groups = parser.parse()
+
+                    self.assertEqual((puzzle.id, puzzle.num_houses), (raw.ID, parser.num_houses))
+                    self.assertEqual(puzzle.records.tolist(), [list(r) for r in parser.records])
+                    self.assertEqual(puzzle.clues, parser.clues)
+
+                    c_variables, c_domains, c_constraints, c_groups = puzzle.parse()
+                    self.assertEqual((c_variables, c_domains, c_groups), (variables, domains, groups))
+                    self.assertEqual([(scope, clue) for _, scope, clue in c_constraints],
+                                     [(scope, clue) for _, scope, clue in constraints])
+
+                last = raws[-1].ID
+                self.assertEqual(dataset.get(last).id, last)
+                # Workers get the path and map the file again
+                with pickle.loads(pickle.dumps(dataset)) as copy:
+                    self.assertEqual(copy.get(last).records.tolist(), dataset.get(last).records.tolist())
+
+
+if __name__ == "__main__":
+    # python dataset.py [zebra_puzzles.json | *.parquet | *.csv] [zebra_puzzles.bin]
+    src = sys.argv[1] if len(sys.argv) > 1 else "zebra_puzzles.json"
+    dst = sys.argv[2] if len(sys.argv) > 2 else "zebra_puzzles.bin"
+    count = compile_dataset(PuzzleSource(src), dst)
+    print(f"Compiled {count} puzzles into {dst}")
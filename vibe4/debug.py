@@ -1,23 +1,21 @@
-import json
 from parser import PuzzleParser
 from solver import CSPSolver
+from session import SolverSession
+from shared import PuzzleSource
 
-def debug_puzzle(puzzle_id):
-    # Load data
-    with open("zebra_puzzles.json", "r") as f:
-        puzzles = json.load(f)
-    
-    # Find the specific puzzle
-    puzzle = next((p for p in puzzles if p["id"] == puzzle_id), None)
-    if not puzzle:
+def debug_puzzle(puzzle_id, path="zebra_puzzles.json"):
+    # Find the specific puzzle via the id index (no full load of the file)
+    try:
+        puzzle = PuzzleSource(path).get(puzzle_id)
+    except KeyError:
         print("Puzzle not found!")
         return
 
     print(f"--- Debugging {puzzle_id} ---")
-    print("TEXT:\n", puzzle["puzzle"])
+    print("TEXT:\n", puzzle.text)
     
     # Run Parser
-    parser = PuzzleParser(puzzle)
+    parser = PuzzleParser.from_raw(puzzle)
     variables, domains, constraints, groups = parser.parse()
     
     print(f"\nExtracted {len(variables)} variables.")
@@ -30,8 +28,8 @@ def debug_puzzle(puzzle_id):
     # Run Solver
     print("\nAttempting to solve...")
     solver = CSPSolver(variables, domains)
-    for func, scope in constraints:
-        solver.add_constraint(func, scope)
+    for func, scope, clue in constraints:
+        solver.add_constraint(func, scope, clue)
         
     assignment = solver.solve()
     
@@ -41,6 +39,21 @@ def debug_puzzle(puzzle_id):
     else:
         print("❌ FAILED. The constraints led to a contradiction or search exhaustion.")
 
+    # Which clue pruned what, rendered from the compact trace
+    print("\nDeduction trace:")
+    print(solver.explain(parser.clues))
+    print(f"\nClues that pruned candidates: {solver.trace.clues_used()}")
+
+def toggle_clues(puzzle_id, path="zebra_puzzles.json"):
+    # Drops each clue in turn and re-solves incrementally: which clues matter?
+    session = SolverSession.from_parser(PuzzleParser.from_raw(PuzzleSource(path).get(puzzle_id)))
+    print(f"--- Clue toggles for {puzzle_id} (all clues: {session.uniqueness()}) ---")
+    for clue in sorted({c[2] for c in session.constraints if c[2] > 0}):
+        removed = session.remove_clue(clue)
+        print(f"without clue {clue}: {session.uniqueness()} ({session.steps} steps)")
+        session.add_clue(removed)
+
 # Pick an ID from your 'Failed' list in the logs
 # Example: lgp-test-2x6-8 (Low steps failure) or lgp-test-6x6-13 (High steps failure)
-debug_puzzle("lgp-test-2x6-8")
\ No newline at end of file
+debug_puzzle("lgp-test-2x6-8")
+# toggle_clues("lgp-test-2x6-8")
@@ -0,0 +1,74 @@
+from array import array
+
+# Event kinds. Each event is stored as 4 ints: (kind, clue, variable index, house)
+ASSIGN = 0     # the solver tries variable = house
+PRUNE = 1      # a clue removed house from the variable's domain
+CONFLICT = 2   # a clue rejected variable = house for the current assignment
+WIPEOUT = 3    # a clue emptied the variable's domain -> backtrack
+NOGOOD = 4     # a learned dead end (see CSPSolver nogoods) rejected variable = house
+
+# Clue number used for the implicit "every house has a different X" constraints
+IMPLICIT_CLUE = 0
+
+
+class DeductionTrace:
+    """
+    Compact log of what the solver tried and which clue pruned which candidates.
+    Events are flat ints in an array; text is only built by render()/explain().
+    """
+
+    def __init__(self):
+        self.events = array("i")
+
+    def record(self, kind, clue, var, value):
+        self.events.extend((kind, clue, var, value))
+
+    def __len__(self):
+        return len(self.events) // 4
+
+    def __iter__(self):
+        events = self.events
+        for i in range(0, len(events), 4):
+            yield events[i], events[i + 1], events[i + 2], events[i + 3]
+
+    def clues_used(self):
+        """
+        Returns the clue numbers that pruned or rejected at least one candidate.
+        """
+        return sorted({clue for kind, clue, _, _ in self if kind != ASSIGN and clue != IMPLICIT_CLUE})
+
+    def render(self, variables, clues=None):
+        """
+        Lazily turns the events into readable lines.
+        variables: the solver's variable list (indices refer to it)
+        clues: optional {clue number: clue text} from PuzzleParser
+        """
+        clues = clues or {}
+        step = 0
+
+        for kind, clue, var, value in self:
+            name = variables[var].replace("_", " ")
+
+            if kind == ASSIGN:
+                step += 1
+                yield f"Step {step}: try {name} in house {value}"
+                continue
+
+            if clue == IMPLICIT_CLUE:
+                reason = "Uniqueness"
+            elif clue in clues:
+                reason = f"Clue {clue} ({clues[clue]})"
+            else:
+                reason = f"Clue {clue}"
+
+            if kind == PRUNE:
+                yield f"  {reason} removes house {value} for {name}"
+            elif kind == CONFLICT:
+                yield f"  {reason} rules out {name} in house {value}"
+            elif kind == WIPEOUT:
+                yield f"  {reason} leaves no house for {name} -> backtrack"
+            elif kind == NOGOOD:
+                yield f"  Known dead end rules out {name} in house {value}"
+
+    def explain(self, variables, clues=None):
+        return "\n".join(self.render(variables, clues))
@@ -1,16 +1,15 @@
 import json
+from shared import PuzzleSource
 
 def inspect_first_puzzle():
     filename = "zebra_puzzles.json"
     
     try:
-        with open(filename, 'r') as f:
-            data = json.load(f)
-            
-        print(f"Total puzzles found: {len(data)}")
+        source = PuzzleSource(filename)
+        print(f"Total puzzles found: {len(source.index())} ({source.format})")
         
         # Get the first puzzle
-        first_puzzle = data[0]
+        first_puzzle = next(source.rows())
         
         print("\n--- Keys in the Data ---")
         print(first_puzzle.keys())
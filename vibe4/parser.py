@@ -1,4 +1,7 @@
 import re
+from relations import (relation, UNUSED, EQ, NEQ, NEXT_TO, LEFT_OF, RIGHT_OF,
+                       BEFORE, AFTER, GAP, AT, NOT_NEXT_TO, NOT_LEFT_OF, NOT_RIGHT_OF,
+                       NOT_BEFORE, NOT_AFTER, BETWEEN, END, NOT_AT)
 
 class PuzzleParser:
     def __init__(self, puzzle_data):
@@ -14,7 +17,25 @@ class PuzzleParser:
         self.groups = []
         self.variables = []
         self.domains = {}
-        self.constraints = [] # List of tuples: (function, [var_names])
+        self.constraints = [] # List of tuples: (function, [var_names], clue_number)
+        self.clues = {} # clue_number -> clue text, for the deduction trace
+        self.records = [] # Same constraints as IR records: (kind, clue, a, b, c, arg)
+        self.var_index = {}
+
+    @classmethod
+    def from_raw(cls, raw):
+        """
+        Builds a parser from a RawProblem as yielded by PuzzleSource.
+        """
+        return cls({"id": raw.ID, "puzzle": raw.text, "size": raw.size})
+
+    def add(self, kind, scope, clue, arg=0):
+        """
+        Adds a constraint both as a solver tuple and as a compact IR record.
+        """
+        self.constraints.append((relation(kind, arg), scope, clue))
+        idx = [self.var_index[v] for v in scope] + [UNUSED] * (3 - len(scope))
+        self.records.append((kind, clue, idx[0], idx[1], idx[2], arg))
 
     def parse(self):
         lines = self.puzzle_text.split('\n')
@@ -30,29 +51,26 @@ class PuzzleParser:
                 self.groups.append(cleaned_items)
                 self.variables.extend(cleaned_items)
 
+        self.var_index = {v: i for i, v in enumerate(self.variables)}
+
         # Set Domains
         house_domain = list(range(1, self.num_houses + 1))
         for var in self.variables:
             self.domains[var] = house_domain
 
         # --- 2. Implicit Constraints (AllDiff) ---
+        # Clue number 0 marks constraints that are not stated in the text
         for group in self.groups:
             for i in range(len(group)):
                 for j in range(i+1, len(group)):
-                    self.constraints.append((lambda x, y: x != y, [group[i], group[j]]))
+                    self.add(NEQ, [group[i], group[j]], 0)
 
         # --- 3. Parse Text Clues ---
+        # One alternation over all entity names, longest first, built once per
+        # puzzle: "very short" is found before "short" can match inside it
         var_map = {v.lower().replace("_", " "): v for v in self.variables}
-        
-        # Helper for ordinals
-        ordinals = {
-            "first": 1, "1st": 1, "house 1": 1,
-            "second": 2, "2nd": 2, "house 2": 2,
-            "third": 3, "3rd": 3, "house 3": 3,
-            "fourth": 4, "4th": 4, "house 4": 4,
-            "fifth": 5, "5th": 5, "house 5": 5,
-            "sixth": 6, "6th": 6, "house 6": 6
-        }
+        names = sorted(var_map, key=len, reverse=True)
+        entity_re = re.compile("|".join(re.escape(n) for n in names)) if names else None
 
         clue_section = False
         for line in lines:
@@ -62,82 +80,110 @@ class PuzzleParser:
             if not clue_section: continue
             if not line.strip(): continue
 
-            line_lower = line.lower()
-            
-            # --- FIXED: Longest Match First Strategy ---
-            # 1. Sort variables by length (Longest first) to avoid "Short" matching inside "Very Short"
-            sorted_vars = sorted(var_map.items(), key=lambda x: len(x[0]), reverse=True)
-            
-            found_vars = []
-            # We use a temporary string to "mask out" found variables so they aren't found again
-            temp_line = line_lower
-            
-            for v_key, v_real in sorted_vars:
-                # Iterate to find ALL occurrences of this variable
-                start = 0
-                while True:
-                    idx = temp_line.find(v_key, start)
-                    if idx == -1:
-                        break
-                    
-                    # Store original index (from line_lower) and variable
-                    # Note: indices in temp_line correspond to line_lower because we only replace with spaces
-                    found_vars.append((idx, v_real))
-                    
-                    # Mask this occurrence in temp_line with spaces to prevent substring matching
-                    # e.g. "very short" -> "          " so "short" won't find it later
-                    mask = " " * len(v_key)
-                    temp_line = temp_line[:idx] + mask + temp_line[idx+len(v_key):]
-                    
-                    start = idx + len(v_key)
-
-            # 2. Sort by position in the sentence (to handle "Left/Right" logic correctly)
-            found_vars.sort(key=lambda x: x[0])
-            
-            # 3. Extract final list (deduplicated)
-            mentioned = []
-            seen = set()
-            for _, v_real in found_vars:
-                if v_real not in seen:
-                    mentioned.append(v_real)
-                    seen.add(v_real)
-            
-            # -------------------------------------------
-
-            # --- CASE A: Unary Constraints ---
-            if len(mentioned) == 1:
-                target_var = mentioned[0]
-                for word, house_num in ordinals.items():
-                    if re.search(r'\b' + re.escape(word) + r'\b', line_lower):
-                        self.constraints.append((lambda x, h=house_num: x == h, [target_var]))
-                        break
-
-            # --- CASE B: Binary Constraints ---
-            if len(mentioned) >= 2:
-                v1, v2 = mentioned[0], mentioned[1]
-
-                if " is " in line_lower and not any(k in line_lower for k in ["next", "left", "right", "between", "neighbor"]):
-                    self.constraints.append((lambda a, b: a == b, [v1, v2]))
-
-                elif "next to" in line_lower or "neighbor" in line_lower:
-                    self.constraints.append((lambda a, b: abs(a - b) == 1, [v1, v2]))
-
-                elif "directly left" in line_lower or "immediately left" in line_lower:
-                    self.constraints.append((lambda a, b: a == b - 1, [v1, v2]))
-                
-                elif "directly right" in line_lower or "immediately right" in line_lower:
-                    self.constraints.append((lambda a, b: a == b + 1, [v1, v2]))
-
-                elif "left" in line_lower:
-                    self.constraints.append((lambda a, b: a < b, [v1, v2]))
-
-                elif "right" in line_lower:
-                    self.constraints.append((lambda a, b: a > b, [v1, v2]))
-
-                elif "one house between" in line_lower:
-                    self.constraints.append((lambda a, b: abs(a - b) == 2, [v1, v2]))
-                
-                elif "two houses between" in line_lower:
-                    self.constraints.append((lambda a, b: abs(a - b) == 3, [v1, v2]))
-
-        return self.variables, self.domains, self.constraints, self.groups
\ No newline at end of file
+            # "12. The fish enthusiast ..." -> clue 12
+            numbered = re.match(r'\s*(\d+)\.\s*(.*)', line)
+            if numbered:
+                clue_no = int(numbered.group(1))
+                self.clues[clue_no] = numbered.group(2).strip()
+            else:
+                clue_no = len(self.clues) + 1
+                self.clues[clue_no] = line.strip()
+
+            if entity_re is not None:
+                self._parse_clue(self.clues[clue_no].lower(), clue_no, entity_re, var_map)
+
+        return self.variables, self.domains, self.constraints, self.groups
+    def _parse_clue(self, text, clue_no, entity_re, var_map):
+        """
+        Masks every entity mention as "@<n>" (n = position in `mentioned`, a
+        repeated entity keeps its number) and hands the clue to the first
+        template of CLUE_GRAMMAR that matches.
+        """
+        mentioned = []
+
+        def mask(match):
+            var = var_map[match.group(0)]
+            if var not in mentioned:
+                mentioned.append(var)
+            return f"@{mentioned.index(var)}"
+
+        masked = entity_re.sub(mask, text)
+
+        for pattern, kind, arg in CLUE_GRAMMAR:
+            match = pattern.search(masked)
+            if not match: continue
+
+            scope = [mentioned[int(match.group(slot)[1:])] for slot in SLOTS if slot in pattern.groupindex]
+            if len(set(scope)) < len(scope): continue
+
+            if arg == HOUSE_ARG:
+                arg = house_number(match.group("h"), self.num_houses)
+            elif arg == COUNT_ARG:
+                arg = self.num_houses
+            self.add(kind, scope, clue_no, arg)
+            return
+
+
+# --- Clue grammar ---
+# Templates are tried in order on the masked clue, the first match wins, so
+# negated and more specific phrasings come before the general ones. Slots:
+# {a} {b} {c} entity mentions (constraint scope in this order), {h} a house,
+# {not} a negation. A leading lookahead accepts the keyword anywhere.
+
+SLOTS = ("a", "b", "c")
+HOUSE_ARG = "h"   # arg is the house named by the {h} slot
+COUNT_ARG = "n"   # arg is the number of houses
+
+ORDINALS = {
+    "first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3,
+    "fourth": 4, "4th": 4, "fifth": 5, "5th": 5, "sixth": 6, "6th": 6,
+}
+
+_SLOT_PATTERNS = {
+    "a": r"(?P<a>@\d+)", "b": r"(?P<b>@\d+)", "c": r"(?P<c>@\d+)",
+    "not": r"(?:\bnot\b|n't\b)",
+    "h": r"(?P<h>\b(?:" + "|".join(ORDINALS) + r"|middle|last) house\b|\bhouse (?:number )?\d+)",
+}
+
+_TEMPLATES = [
+    (r"{a}.*?\bsomewhere between\b.*?{b}.*?{c}", BETWEEN, 0),
+    (r"\b(?:one|1) house between\b.*?{a}.*?{b}", GAP, 2),
+    (r"\b(?:two|2) houses between\b.*?{a}.*?{b}", GAP, 3),
+    (r"\b(?:three|3) houses between\b.*?{a}.*?{b}", GAP, 4),
+
+    (r"^(?=.*?{not} (?:next to|neighbou?rs?)\b).*?{a}.*?{b}", NOT_NEXT_TO, 0),
+    (r"^(?=.*?\b(?:next to|neighbou?rs?)\b).*?{a}.*?{b}", NEXT_TO, 0),
+
+    (r"{a}.*?{not} (?:directly|immediately) (?:to the )?left of\b.*?{b}", NOT_LEFT_OF, 0),
+    (r"{a}.*?{not} (?:directly|immediately) (?:to the )?right of\b.*?{b}", NOT_RIGHT_OF, 0),
+    (r"{a}.*?\b(?:directly|immediately) (?:to the )?left of\b.*?{b}", LEFT_OF, 0),
+    (r"{a}.*?\b(?:directly|immediately) (?:to the )?right of\b.*?{b}", RIGHT_OF, 0),
+    (r"{a}.*?{not}.*?\bleft of\b.*?{b}", NOT_BEFORE, 0),
+    (r"{a}.*?{not}.*?\bright of\b.*?{b}", NOT_AFTER, 0),
+    (r"{a}.*?\bleft\b.*?{b}", BEFORE, 0),
+    (r"{a}.*?\bright\b.*?{b}", AFTER, 0),
+
+    (r"{a}.*?\bat (?:one of )?the ends?\b", END, COUNT_ARG),
+    (r"{a}.*?{not}.*?{h}", NOT_AT, HOUSE_ARG),
+    (r"{a}.*?{h}", AT, HOUSE_ARG),
+    (r"{h}.*?{a}", AT, HOUSE_ARG),
+
+    (r"{a}.*?{not}.*?{b}", NEQ, 0),
+    (r"{a}.*?{b}", EQ, 0),
+]
+
+CLUE_GRAMMAR = [(re.compile(t.format(**_SLOT_PATTERNS)), kind, arg) for t, kind, arg in _TEMPLATES]
+
+
+def house_number(text, num_houses):
+    """
+    "second house" -> 2, "house 3" -> 3, "last house" -> num_houses
+    """
+    word = text.split()[0]
+    if word == "house":
+        return int(text.split()[-1])
+    if word == "middle":
+        return (num_houses + 1) // 2
+    if word == "last":
+        return num_houses
+    return ORDINALS[word]
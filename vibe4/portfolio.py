@@ -0,0 +1,353 @@
+import importlib.util
+import json
+import multiprocessing
+import os
+import queue
+import statistics
+import sys
+import time
+import unittest
+
+from parser import PuzzleParser
+from solver import CSPSolver, SOLVED, FAILED
+from relations import KIND_NAMES, EQ, NEQ
+from shared import PuzzleSource, SRC_DIR
+
+# --- Engines ---
+# "csp":       vibe4 CSPSolver (MRV + forward checking) on the vibe4 parse
+# "backtrack": src Solver (plain chronological backtracking) on the src parse
+# Every answer is checked against the vibe4 constraints, so an engine whose
+# parser missed a clue cannot return a wrong grid.
+CSP = "csp"
+BACKTRACK = "backtrack"
+ENGINES = (CSP, BACKTRACK)
+
+# Profile -> engine, written by `python portfolio.py bench`
+ROUTES_FILE = "portfolio_routes.json"
+
+# Used for profiles the benchmark has not seen
+DEFAULT_ENGINE = CSP
+
+NODE_BUDGET = 50000
+TIME_BUDGET = 5.0
+
+# Race mode: seconds between checks on the workers while waiting, and the
+# time allowed beyond TIME_BUDGET before the race is given up
+RACE_POLL = 0.5
+RACE_GRACE = 5.0
+
+
+def features(parser):
+    """
+    Cheap features of a parsed puzzle: size and a histogram of the clue kinds.
+    """
+    clue_kinds = [KIND_NAMES[r[0]] for r in parser.records if r[1] != 0]
+    histogram = {}
+    for kind in clue_kinds:
+        histogram[kind] = histogram.get(kind, 0) + 1
+
+    relational = histogram.get(KIND_NAMES[EQ], 0) + histogram.get(KIND_NAMES[NEQ], 0)
+    return {
+        "houses": parser.num_houses,
+        "attributes": len(parser.groups),
+        "clues": len(clue_kinds),
+        "positional": (len(clue_kinds) - relational) / len(clue_kinds) if clue_kinds else 0.0,
+        "kinds": histogram,
+    }
+
+
+def profile(feats):
+    """
+    Routing key: grid size plus the share of positional clues in thirds,
+    e.g. "5x6/high".
+    """
+    share = feats["positional"]
+    mix = "low" if share < 1 / 3 else "mid" if share < 2 / 3 else "high"
+    return f"{feats['houses']}x{feats['attributes']}/{mix}"
+
+
+# --- Engine runners ---
+
+_src = None
+
+
+def _src_modules():
+    """
+    src/parser.py and src/solver.py share their module names with vibe4's, so
+    they are loaded from their files under private names.
+    """
+    global _src
+    if _src is None:
+        loaded = []
+        for name in ("parser", "solver"):
+            spec = importlib.util.spec_from_file_location(f"src_{name}", os.path.join(SRC_DIR, f"{name}.py"))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            loaded.append(module)
+        _src = tuple(loaded)
+    return _src
+
+
+def run_csp(raw, parser, max_nodes, time_limit):
+    solver = CSPSolver(parser.variables, parser.domains, max_nodes=max_nodes, time_limit=time_limit)
+    for func, scope, clue in parser.constraints:
+        solver.add_constraint(func, scope, clue)
+    assignment = solver.solve()
+    return assignment or {}, solver.steps, solver.status
+
+
+def run_backtrack(raw, parser, max_nodes, time_limit):
+    src_parser, src_solver = _src_modules()
+    parsed = src_parser.Parser().parseGridmode(raw)
+    solution = src_solver.Solver(max_nodes=max_nodes, time_limit=time_limit).solve(parsed)
+
+    # src houses hold the raw values, vibe4 variables use "_" for spaces
+    assignment = {}
+    for house, person in enumerate(solution.ppl, 1):
+        for value in person["properties"].values():
+            assignment[value.replace(" ", "_")] = house
+    return assignment, solution.steps, solution.status
+
+
+RUNNERS = {CSP: run_csp, BACKTRACK: run_backtrack}
+
+
+def verify(assignment, parser):
+    """
+    True if the assignment is complete and satisfies every vibe4 constraint.
+    """
+    if any(v not in assignment for v in parser.variables):
+        return False
+    return all(func(*[assignment[v] for v in scope]) for func, scope, clue in parser.constraints)
+
+
+def run_engine(engine, raw, parser, max_nodes=NODE_BUDGET, time_limit=TIME_BUDGET):
+    """
+    Returns (assignment, steps, status). A grid that fails verify() is
+    reported as FAILED; a crash inside an engine counts as a failure too.
+    """
+    try:
+        assignment, steps, status = RUNNERS[engine](raw, parser, max_nodes, time_limit)
+    except Exception:
+        return {}, 0, FAILED
+    if status == SOLVED and not verify(assignment, parser):
+        status = FAILED
+    return assignment, steps, status
+
+
+def _race_worker(engine, raw, max_nodes, time_limit, results):
+    # Always posts exactly one result, the parent counts on it
+    try:
+        parser = PuzzleParser.from_raw(raw)
+        parser.parse()
+        outcome = run_engine(engine, raw, parser, max_nodes, time_limit)
+    except Exception:
+        outcome = ({}, 0, FAILED)
+    results.put((engine, outcome))
+
+
+class Portfolio:
+    """
+    Routes each puzzle to the engine the benchmark found fastest for its
+    profile, or with race=True runs two engines in parallel processes and
+    keeps the first verified answer.
+
+    Race mode starts two new processes for every puzzle (nothing is reused),
+    which costs more than most puzzles take to solve. It is meant for a few
+    hard puzzles; route larger batches.
+
+        portfolio = Portfolio.load()
+        for raw in PuzzleSource("zebra_puzzles.json"):
+            engine, assignment, steps, status = portfolio.solve(raw)
+    """
+
+    def __init__(self, routes=None, race=False, max_nodes=NODE_BUDGET, time_limit=TIME_BUDGET):
+        self.routes = routes or {}
+        self.race = race
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+
+    @classmethod
+    def load(cls, path=ROUTES_FILE, **kwargs):
+        routes = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                routes = json.load(f)["routes"]
+        return cls(routes, **kwargs)
+
+    def choose(self, feats):
+        return self.routes.get(profile(feats), DEFAULT_ENGINE)
+
+    def engines(self, feats):
+        """
+        The chosen engine first, then the others as fallbacks.
+        """
+        first = self.choose(feats)
+        return [first] + [e for e in ENGINES if e != first]
+
+    def solve(self, raw):
+        """
+        Returns (engine, assignment, steps, status). `parser` is available
+        afterwards as self.parser for formatting the grid.
+        """
+        self.parser = PuzzleParser.from_raw(raw)
+        self.parser.parse()
+        order = self.engines(features(self.parser))
+
+        if self.race:
+            return self._race(raw, order[:2])
+
+        result = None
+        for engine in order:
+            assignment, steps, status = run_engine(engine, raw, self.parser, self.max_nodes, self.time_limit)
+            if status == SOLVED:
+                return engine, assignment, steps, status
+            result = result or (engine, assignment, steps, status)
+        return result
+
+    def _race(self, raw, engines):
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=_race_worker, args=(e, raw, self.max_nodes, self.time_limit, results), daemon=True)
+                   for e in engines]
+        for w in workers:
+            w.start()
+
+        # Workers stop at their own budget; the grace covers start-up and parsing
+        deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit + RACE_GRACE
+        first = None
+        pending = len(workers)
+        try:
+            while pending:
+                try:
+                    engine, (assignment, steps, status) = results.get(timeout=RACE_POLL)
+                except queue.Empty:
+                    # A worker killed from outside (e.g. out of memory) posts nothing
+                    if not any(w.is_alive() for w in workers) and results.empty():
+                        break
+                    if deadline is not None and time.perf_counter() > deadline:
+                        break
+                    continue
+                pending -= 1
+                if status == SOLVED:
+                    return engine, assignment, steps, status
+                first = first or (engine, assignment, steps, status)
+            return first or (engines[0], {}, 0, FAILED)
+        finally:
+            # The loser is still searching, stop it
+            for w in workers:
+                if w.is_alive():
+                    w.terminate()
+                w.join()
+
+
+# --- Benchmark ---
+
+def benchmark(raws, engines=ENGINES, max_nodes=NODE_BUDGET, time_limit=TIME_BUDGET):
+    """
+    Runs every engine on every puzzle. Returns one row per (puzzle, engine):
+    {"id", "profile", "engine", "seconds", "solved"}.
+    """
+    rows = []
+    for raw in raws:
+        parser = PuzzleParser.from_raw(raw)
+        parser.parse()
+        key = profile(features(parser))
+        for engine in engines:
+            start = time.perf_counter()
+            _, _, status = run_engine(engine, raw, parser, max_nodes, time_limit)
+            rows.append({"id": raw.ID, "profile": key, "engine": engine,
+                         "seconds": time.perf_counter() - start, "solved": status == SOLVED})
+    return rows
+
+
+def build_routes(rows):
+    """
+    Per profile, the engine that solves the most puzzles, ties broken by the
+    lower median time.
+    """
+    by_profile = {}
+    for row in rows:
+        by_profile.setdefault(row["profile"], {}).setdefault(row["engine"], []).append(row)
+
+    routes = {}
+    for key, engines in by_profile.items():
+        def score(engine):
+            runs = engines[engine]
+            return (-sum(r["solved"] for r in runs), statistics.median(r["seconds"] for r in runs))
+        routes[key] = min(engines, key=score)
+    return routes
+
+
+class PortfolioTest(unittest.TestCase):
+    def _raws(self, limit):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zebra_puzzles.json")
+        return list(PuzzleSource(path, limit=limit))
+
+    def testSolveTakesBenchRoutes(self):
+        from unittest import mock
+
+        raws = self._raws(8)
+        bench_routes = build_routes(benchmark(raws))
+        # The same profiles sent to the other engine, so the route is not just the default
+        forced = {key: BACKTRACK for key in bench_routes}
+
+        for routes in (bench_routes, forced):
+            portfolio = Portfolio(routes)
+            for raw in raws:
+                with mock.patch(f"{__name__}.run_engine", side_effect=run_engine) as runs:
+                    engine, assignment, steps, status = portfolio.solve(raw)
+                routed = routes[profile(features(portfolio.parser))]
+                self.assertEqual(runs.call_args_list[0].args[0], routed, raw.ID)
+                if status == SOLVED and runs.call_count == 1:
+                    self.assertEqual(engine, routed)
+
+    def testVerifyRejectsWrongGrid(self):
+        raw = self._raws(1)[0]
+        engine, assignment, steps, status = Portfolio().solve(raw)
+        parser = PuzzleParser.from_raw(raw)
+        parser.parse()
+        self.assertEqual(status, SOLVED)
+        self.assertTrue(verify(assignment, parser))
+
+        # Two values of one category swap houses
+        a, b = parser.groups[0][:2]
+        self.assertFalse(verify(dict(assignment, **{a: assignment[b], b: assignment[a]}), parser))
+        self.assertFalse(verify({v: h for v, h in assignment.items() if v != a}, parser))
+
+    def testRaceReturnsVerifiedAnswer(self):
+        raw = self._raws(1)[0]
+        engine, assignment, steps, status = Portfolio(race=True).solve(raw)
+        self.assertIn(engine, ENGINES)
+        self.assertEqual(status, SOLVED)
+        self.assertEqual(assignment, Portfolio().solve(raw)[1])
+
+
+if __name__ == "__main__":
+    # python portfolio.py bench [puzzles] [limit]   -> writes portfolio_routes.json
+    # python portfolio.py [--race] [puzzles]         -> solves with the routes
+    #                                                   (--race: small batches only)
+    args = sys.argv[1:]
+    race = "--race" in args
+    args = [a for a in args if a != "--race"]
+
+    if args and args[0] == "bench":
+        path = args[1] if len(args) > 1 else "zebra_puzzles.json"
+        limit = int(args[2]) if len(args) > 2 else None
+        rows = benchmark(PuzzleSource(path, limit=limit))
+        routes = build_routes(rows)
+        with open(ROUTES_FILE, "w") as f:
+            json.dump({"source": path, "puzzles": len(rows) // len(ENGINES), "routes": routes}, f, indent=2, sort_keys=True)
+        for key in sorted(routes):
+            print(f"{key:>12} -> {routes[key]}")
+        print(f"📊 Routes for {len(routes)} profiles saved to '{ROUTES_FILE}'.")
+    else:
+        path = args[0] if args else "zebra_puzzles.json"
+        portfolio = Portfolio.load(race=race)
+        solved, used = 0, {}
+        start = time.perf_counter()
+        for raw in PuzzleSource(path):
+            engine, assignment, steps, status = portfolio.solve(raw)
+            solved += status == SOLVED
+            used[engine] = used.get(engine, 0) + 1
+            print(f"{'✅' if status == SOLVED else '❌'} {raw.ID} | {engine} | Steps: {steps}")
+        print(f"\n🎉 Solved {solved} puzzles in {time.perf_counter() - start:.1f}s, engines used: {used}")
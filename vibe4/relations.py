@@ -0,0 +1,76 @@
+# Constraint IR shared by the parser, the compiled dataset and the solvers.
+# A compiled constraint is one fixed-width int record:
+#   (kind, clue, a, b, c, arg)
+# a/b/c are variable indices (-1 when unused), arg is a kind-specific number
+# (house number for AT/NOT_AT, number of houses for END, distance for GAP).
+
+RECORD_WIDTH = 6
+UNUSED = -1
+
+EQ = 0             # a == b                  "The German is Bob"
+NEQ = 1            # a != b                  implicit AllDiff inside a group
+NEXT_TO = 2        # |a - b| == 1            "... are next to each other"
+LEFT_OF = 3        # a == b - 1              "directly left of"
+RIGHT_OF = 4       # a == b + 1              "directly right of"
+BEFORE = 5         # a < b                   "somewhere to the left of"
+AFTER = 6          # a > b                   "somewhere to the right of"
+GAP = 7            # |a - b| == arg          "one house between" -> arg 2
+AT = 8             # a == arg                "... is in the second house"
+NOT_NEXT_TO = 9    # |a - b| != 1            "... are not next to each other"
+NOT_LEFT_OF = 10   # a != b - 1              "not directly left of"
+NOT_RIGHT_OF = 11  # a != b + 1              "not directly right of"
+NOT_BEFORE = 12    # a >= b                  "not somewhere to the left of"
+NOT_AFTER = 13     # a <= b                  "not somewhere to the right of"
+BETWEEN = 14       # b < a < c or c < a < b  "a is somewhere between b and c"
+END = 15           # a in (1, arg)           "... is at one of the ends"
+NOT_AT = 16        # a != arg                "... is not in the second house"
+
+KIND_NAMES = {
+    EQ: "eq", NEQ: "neq", NEXT_TO: "next_to", LEFT_OF: "left_of", RIGHT_OF: "right_of",
+    BEFORE: "before", AFTER: "after", GAP: "gap", AT: "at",
+    NOT_NEXT_TO: "not_next_to", NOT_LEFT_OF: "not_left_of", NOT_RIGHT_OF: "not_right_of",
+    NOT_BEFORE: "not_before", NOT_AFTER: "not_after", BETWEEN: "between", END: "end", NOT_AT: "not_at",
+}
+
+_BINARY = {
+    EQ: lambda a, b: a == b,
+    NEQ: lambda x, y: x != y,
+    NEXT_TO: lambda a, b: abs(a - b) == 1,
+    LEFT_OF: lambda a, b: a == b - 1,
+    RIGHT_OF: lambda a, b: a == b + 1,
+    BEFORE: lambda a, b: a < b,
+    AFTER: lambda a, b: a > b,
+    NOT_NEXT_TO: lambda a, b: abs(a - b) != 1,
+    NOT_LEFT_OF: lambda a, b: a != b - 1,
+    NOT_RIGHT_OF: lambda a, b: a != b + 1,
+    NOT_BEFORE: lambda a, b: a >= b,
+    NOT_AFTER: lambda a, b: a <= b,
+}
+
+
+def relation(kind, arg=0):
+    """
+    Returns the predicate the solver calls with the house numbers of the scope.
+    """
+    if kind in _BINARY:
+        return _BINARY[kind]
+    if kind == GAP:
+        return lambda a, b, d=arg: abs(a - b) == d
+    if kind == AT:
+        return lambda x, h=arg: x == h
+    if kind == NOT_AT:
+        return lambda x, h=arg: x != h
+    if kind == END:
+        return lambda x, n=arg: x == 1 or x == n
+    if kind == BETWEEN:
+        return lambda a, b, c: min(b, c) < a < max(b, c)
+    raise ValueError(f"Unknown constraint kind: {kind}")
+
+
+def to_constraint(record, variables):
+    """
+    Rebuilds the parser's (func, scope, clue) tuple from an IR record.
+    """
+    kind, clue, a, b, c, arg = (int(x) for x in record)
+    scope = [variables[i] for i in (a, b, c) if i != UNUSED]
+    return relation(kind, arg), scope, clue
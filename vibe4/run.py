@@ -1,12 +1,62 @@
-import json
-import pandas as pd
+import os
 import time
+from logging import INFO
 from parser import PuzzleParser
-from solver import CSPSolver
+from solver import CSPSolver, SOLVED, TIMEOUT
+from batch import solve_all
+from dataset import CompiledDataset
+from shared import PuzzleSource, ResultWriter, configure_logs, get_logger
 
-def format_grid_solution(solution, groups):
+CHECK_UNIQUENESS = False
+
+# Built with `python dataset.py`; used instead of the JSON when present
+COMPILED_FILE = "zebra_puzzles.bin"
+
+# Results are appended to this file while the run progresses. With RESUME the
+# rows of an interrupted run are kept and their puzzles skipped. A .parquet
+# name writes the grids as a `solution` struct column for ../src/score.py.
+RESULTS_FILE = "results.csv"
+RESUME = False
+
+# Per-puzzle search budgets (None = unlimited). A puzzle that runs out is
+# reported as "timeout" with the best partial grid found.
+NODE_BUDGET = 50000
+TIME_BUDGET = 5.0
+
+# Propagate all puzzles of a size together with NumPy (batch.py) and search
+# only the ones propagation leaves open
+BATCH_PROPAGATION = True
+
+# Per-puzzle lines are logged at INFO (results) and DEBUG (progress), so the
+# default WARNING level runs without formatting them. LOG_LEVEL = None uses
+# $ZEBRA_LOG_LEVEL; LOG_JSON names a file for JSON lines.
+LOG_LEVEL = None
+LOG_JSON = None
+
+log = get_logger("vibe4.run")
+
+def make_solver(variables, domains, constraints):
+    solver = CSPSolver(variables, domains, max_nodes=NODE_BUDGET, time_limit=TIME_BUDGET)
+    for func, scope, clue in constraints:
+        solver.add_constraint(func, scope, clue)
+    return solver
+
+def solve_one(variables, domains, constraints):
+    """
+    Plain search for one puzzle. Returns (assignment, status, steps).
+    """
+    try:
+        solver = make_solver(variables, domains, constraints)
+        assignment = solver.solve()
+        return assignment, solver.status, solver.steps
+    except Exception as e:
+        log.warning("Solver error: %s", e)
+        return {}, "error", 0
+
+def format_grid_solution(solution, groups, num_houses=None):
     """
     Formats the solver output into the specific JSON structure required.
+    Partial solutions (budget timeouts) leave the missing cells as "None".
     """
     if not solution:
         return {"header": [], "rows": []}
@@ -17,24 +67,20 @@ def format_grid_solution(solution, groups):
     # so we name them Group1, Group2, or infer from content. 
     # For now, generic headers match the row count.
     
-    num_houses = max(solution.values())
+    num_houses = num_houses or max(solution.values())
     
     # Sort groups to ensure consistent column order
     # (Optional: In a real scenario, you try to match the header names provided in the 'solution' dummy)
     
-    rows = []
-    for h in range(1, num_houses + 1):
-        row = [str(h)] # First column is always House Number
-        
-        for group in groups:
-            # Find which member of this group is in house h
-            found_member = "None"
-            for member in group:
-                if solution.get(member) == h:
-                    found_member = member
-                    break
-            row.append(found_member)
-        rows.append(row)
+    # One pass over the assignment: each member is written straight into the
+    # row of its house. First column is always House Number.
+    rows = [[str(h)] + ["None"] * len(groups) for h in range(1, num_houses + 1)]
+    for col, group in enumerate(groups, 1):
+        for member in group:
+            h = solution.get(member)
+            # The first member of the group placed in a house keeps the cell
+            if h is not None and 0 < h <= num_houses and rows[h - 1][col] == "None":
+                rows[h - 1][col] = member
 
     # Construct Header
     headers = ["House"] + [f"Category_{i+1}" for i in range(len(groups))]
@@ -42,68 +88,103 @@ def format_grid_solution(solution, groups):
     return {"header": headers, "rows": rows}
 
 def main():
+    configure_logs(LOG_LEVEL, LOG_JSON)
     print("🚀 Starting Solver Pipeline...")
     
     # Load Data
-    try:
-        with open("zebra_puzzles.json", "r") as f:
-            puzzles = json.load(f)
-    except FileNotFoundError:
-        print("❌ Error: zebra_puzzles.json not found.")
-        return
+    # Each entry is (id, parser); parser.parse() returns the CSP either by
+    # parsing the text or by reading the pre-compiled binary dataset.
+    if os.path.exists(COMPILED_FILE):
+        dataset = CompiledDataset(COMPILED_FILE)
+        puzzles = [(p.id, p) for p in dataset]
+    else:
+        try:
+            puzzles = [(raw.ID, PuzzleParser.from_raw(raw)) for raw in PuzzleSource("zebra_puzzles.json")]
+        except FileNotFoundError:
+            print("❌ Error: zebra_puzzles.json not found.")
+            return
 
-    results = []
-    
     # Limit for testing? Set to None to run all.
     # puzzles = puzzles[:5] 
 
+    # Dataset QA: also report whether each parsed clue set has a unique solution.
+    # Stops at the second solution, but still roughly doubles the runtime.
+    check_uniqueness = CHECK_UNIQUENESS
+
     total_puzzles = len(puzzles)
-    solved_count = 0
 
-    for idx, puzzle_data in enumerate(puzzles):
-        pid = puzzle_data.get("id", idx)
-        print(f"[{idx+1}/{total_puzzles}] Parsing {pid}...", end="\r")
+    fields = ["id", "grid_solution", "steps", "status"] + (["uniqueness"] if check_uniqueness else [])
+    results = ResultWriter(RESULTS_FILE, fields, resume=RESUME)
 
+    # 1. Parse every puzzle once
+    parsed = []
+    for idx, (pid, parser) in enumerate(puzzles):
+        if pid in results.done:
+            continue
+        log.debug("[%d/%d] Parsing %s", idx + 1, total_puzzles, pid)
         try:
-            # 1. Parse
-            parser = PuzzleParser(puzzle_data)
-            variables, domains, constraints, groups = parser.parse()
-
-            # 2. Solve
-            solver = CSPSolver(variables, domains)
-            for func, scope in constraints:
-                solver.add_constraint(func, scope)
-
-            start_time = time.time()
-            assignment = solver.solve()
-            duration = time.time() - start_time
-
-            # 3. Store Results
-            if assignment:
-                solved_count += 1
-                grid_json = format_grid_solution(assignment, groups)
-                status = "✅ Solved"
-            else:
-                grid_json = {} # Empty if failed
-                status = "❌ Failed"
-
-            print(f"[{idx+1}/{total_puzzles}] {status} ID: {pid} | Steps: {solver.steps} | Time: {duration:.4f}s")
-
-            results.append({
-                "id": pid,
-                "grid_solution": json.dumps(grid_json), # Needs to be a JSON string
-                "steps": solver.steps
-            })
-            
+            parsed.append((idx, pid, parser, parser.parse()))
         except Exception as e:
-            print(f"\nError on {pid}: {e}")
-            results.append({"id": pid, "grid_solution": "{}", "steps": 0})
+            log.warning("Error on %s: %s", pid, e, extra={"puzzle": pid})
+            results.write({"id": pid, "grid_solution": {}, "steps": 0, "status": "error"})
+
+    # 2. Solve: batch propagation per puzzle size, search only where it is needed.
+    # Outcomes arrive one by one and are written as they come.
+    start_time = time.time()
+    if BATCH_PROPAGATION:
+        outcomes = solve_all([(variables, groups, parser.records, parser.num_houses)
+                              for _, _, parser, (variables, domains, constraints, groups) in parsed],
+                             max_nodes=NODE_BUDGET, time_limit=TIME_BUDGET)
+    else:
+        outcomes = ((i, solve_one(*csp[:3])) for i, (_, _, _, csp) in enumerate(parsed))
+
+    try:
+        solved_count = store_results(parsed, outcomes, results, total_puzzles, check_uniqueness)
+    finally:
+        # Flush the queued rows, also after Ctrl-C or a crash
+        results.close() # Competition usually uses comma or pipe
 
-    # Save CSV
-    df = pd.DataFrame(results)
-    df.to_csv("results.csv", index=False) # Competition usually uses comma or pipe
+    print(f"\n⏱️ Solved in {time.time() - start_time:.2f}s")
     print(f"\n🎉 Finished! Solved {solved_count}/{total_puzzles}.")
-    print("Results saved to 'results.csv'.")
+    print(f"Results saved to '{RESULTS_FILE}'.")
+
+def store_results(parsed, outcomes, results, total_puzzles, check_uniqueness):
+    """
+    3. Store Results: writes each (index into parsed, outcome) as it arrives.
+    Returns the number of solved puzzles.
+    """
+    solved_count = 0
+    for i, (assignment, status, steps) in outcomes:
+        idx, pid, parser, (variables, domains, constraints, groups) = parsed[i]
+        if status == SOLVED:
+            solved_count += 1
+            grid_json = format_grid_solution(assignment, groups, parser.num_houses)
+            label = "✅ Solved"
+        elif status == TIMEOUT:
+            grid_json = format_grid_solution(assignment, groups, parser.num_houses)
+            label = "⏱️ Timeout"
+        else:
+            grid_json = {} # Empty if failed
+            label = "❌ Failed"
+
+        if log.isEnabledFor(INFO):
+            log.info("[%d/%d] %s ID: %s | Steps: %s", idx + 1, total_puzzles, label, pid, steps,
+                     extra={"puzzle": pid, "status": status, "steps": steps})
+
+        result = {
+            "id": pid,
+            "grid_solution": grid_json, # JSON-encoded with its batch by the writer
+            "steps": steps,
+            "status": status
+        }
+        if check_uniqueness:
+            # A separate search so the reported steps stay those of the solve
+            try:
+                result["uniqueness"] = make_solver(variables, domains, constraints).uniqueness()
+            except Exception as e:
+                result["uniqueness"] = "error"
+        results.write(result)
+    return solved_count
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
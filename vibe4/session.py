@@ -0,0 +1,242 @@
+import os
+import random
+import unittest
+from collections import deque
+from itertools import product
+
+from solver import CSPSolver, NogoodStore, SOLVED, FAILED, UNIQUENESS
+
+# Incremental solving for clue experiments (debug.py, ablation runs).
+# The session keeps the domains arc-consistent with the current constraints
+# (AC-3) and logs every pruned value with the constraint that pruned it:
+# - add() only tightens, so it propagates from the new constraint alone.
+# - remove() undoes the log from the first value the removed constraint
+#   pruned; earlier entries did not depend on it. Only the constraints on
+#   the restored variables are propagated again. If it pruned nothing the
+#   removal is free.
+# solve() then searches from the propagated domains.
+
+
+class SolverSession:
+    """
+    A puzzle whose constraint set changes between solves.
+    constraints are (func, scope, clue) tuples as produced by PuzzleParser.
+    """
+
+    def __init__(self, variables, domains, constraints=(), max_nodes=None, time_limit=None):
+        self.variables = variables
+        self.base = {v: list(domains[v]) for v in variables}
+        self.domains = {v: list(d) for v, d in self.base.items()}
+        self.solver = CSPSolver(variables, self.domains, max_nodes=max_nodes, time_limit=time_limit)
+        self.revisions = 0  # constraint revisions done by propagation, for cost comparisons
+
+        self._constraints = {}  # id -> (func, scope, clue), in insertion order
+        self._watch = {v: set() for v in variables}  # variable -> ids of the constraints on it
+        self._log = []  # (variable, value, id) per pruned value, in pruning order
+        self._next_id = 0
+
+        for constraint in constraints:
+            self.add(constraint)
+
+    @classmethod
+    def from_parser(cls, parser, **budgets):
+        variables, domains, constraints, _ = parser.parse()
+        return cls(variables, domains, constraints, **budgets)
+
+    @property
+    def constraints(self):
+        return list(self._constraints.values())
+
+    def add(self, constraint):
+        """
+        Adds a (func, scope, clue) constraint and propagates it.
+        """
+        cid = self._next_id
+        self._next_id += 1
+        self._constraints[cid] = constraint
+        for var in constraint[1]:
+            self._watch[var].add(cid)
+        self._propagate([cid])
+
+    def remove(self, constraint):
+        """
+        Removes a constraint that was added before (the same tuple).
+        """
+        cid = next((i for i, c in self._constraints.items() if c is constraint), None)
+        if cid is None:
+            cid = next((i for i, c in self._constraints.items() if c == constraint), None)
+        if cid is None:
+            raise ValueError("Constraint is not part of the session")
+
+        func, scope, clue = self._constraints.pop(cid)
+        for var in scope:
+            self._watch[var].discard(cid)
+        # Dead ends learned under the old constraint set may be solutions now
+        self.solver.nogoods = NogoodStore(self.solver.nogoods.limit)
+
+        first = next((i for i, entry in enumerate(self._log) if entry[2] == cid), None)
+        if first is None:
+            return
+
+        restored = self._log[first:]
+        del self._log[first:]
+        touched = {var for var, _, _ in restored}
+        for var in touched:
+            keep = set(self.domains[var]) | {value for v, value, _ in restored if v == var}
+            self.domains[var] = [value for value in self.base[var] if value in keep]
+
+        self._propagate(sorted({i for var in touched for i in self._watch[var]}))
+
+    def add_clue(self, constraints):
+        for constraint in constraints:
+            self.add(constraint)
+
+    def remove_clue(self, clue):
+        """
+        Removes every constraint of one clue number and returns them, so the
+        clue can be put back with add_clue().
+        """
+        removed = [c for c in self._constraints.values() if c[2] == clue]
+        for constraint in removed:
+            self.remove(constraint)
+        return removed
+
+    def consistent(self):
+        """
+        False if propagation alone already emptied a domain.
+        """
+        return all(self.domains.values())
+
+    def solve(self):
+        """
+        Searches from the propagated domains. Returns the assignment like
+        CSPSolver.solve(); status and steps are on the session.
+        """
+        if not self.consistent():
+            self.solver.steps = 0
+            self.solver.status = FAILED
+            return None
+        self._sync()
+        return self.solver.solve()
+
+    def count_solutions(self, limit=2):
+        if not self.consistent():
+            self.solver.steps = 0
+            self.solver.status = SOLVED
+            return 0
+        self._sync()
+        return self.solver.count_solutions(limit)
+
+    def uniqueness(self):
+        count = self.count_solutions(limit=2)
+        if self.status != SOLVED:
+            return self.status
+        return UNIQUENESS[count]
+
+    @property
+    def status(self):
+        return self.solver.status
+
+    @property
+    def steps(self):
+        return self.solver.steps
+
+    def _sync(self):
+        self.solver.domains = {v: list(d) for v, d in self.domains.items()}
+        self.solver.constraints = self.constraints
+
+    def _propagate(self, queue):
+        """
+        AC-3 from the given constraint ids until no domain changes. Keeps going
+        after a wipeout, so the log explains every removed value.
+        """
+        pending = deque(queue)
+        queued = set(queue)
+        while pending:
+            cid = pending.popleft()
+            queued.discard(cid)
+            self.revisions += 1
+            func, scope, _ = self._constraints[cid]
+            for var in dict.fromkeys(scope):
+                if self._revise(cid, func, scope, var):
+                    for other in self._watch[var]:
+                        if other != cid and other not in queued:
+                            queued.add(other)
+                            pending.append(other)
+
+    def _revise(self, cid, func, scope, var):
+        """
+        Drops the values of var without support in the other scope domains.
+        """
+        others = [v for v in dict.fromkeys(scope) if v != var]
+        kept = []
+        for value in self.domains[var]:
+            supported = False
+            for combo in product(*(self.domains[o] for o in others)):
+                houses = dict(zip(others, combo))
+                houses[var] = value
+                if func(*[houses[v] for v in scope]):
+                    supported = True
+                    break
+            if supported:
+                kept.append(value)
+            else:
+                self._log.append((var, value, cid))
+
+        changed = len(kept) < len(self.domains[var])
+        self.domains[var] = kept
+        return changed
+
+
+class SolverSessionTest(unittest.TestCase):
+    def _puzzles(self, limit):
+        from parser import PuzzleParser
+        from shared import PuzzleSource
+
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zebra_puzzles.json")
+        return [PuzzleParser.from_raw(raw).parse() for raw in PuzzleSource(path, limit=limit)]
+
+    def assertSameAsFresh(self, session, variables, domains):
+        fresh = SolverSession(variables, domains, session.constraints)
+        self.assertEqual(session.domains, fresh.domains)
+        self.assertEqual(session.uniqueness(), fresh.uniqueness())
+        self.assertEqual(session.solve(), fresh.solve())
+        self.assertEqual(session.status, fresh.status)
+
+    def testAddRemoveMatchesFreshSolve(self):
+        rng = random.Random(7)
+        for variables, domains, constraints, _ in self._puzzles(12):
+            if len(set(variables)) < len(variables):
+                continue  # a value listed twice; CSPSolver reports these as errors
+            session = SolverSession(variables, domains, constraints)
+            self.assertSameAsFresh(session, variables, domains)
+
+            clues = sorted({c[2] for c in constraints})
+            removed = {}
+            for _ in range(6):
+                # Take out a random clue, now and then put an earlier one back
+                clue = rng.choice(clues)
+                if clue in removed and rng.random() < 0.5:
+                    session.add_clue(removed.pop(clue))
+                elif clue not in removed:
+                    removed[clue] = session.remove_clue(clue)
+                # The search after each step learns nogoods that must not outlive it
+                self.assertSameAsFresh(session, variables, domains)
+
+            for clue in list(removed):
+                session.add_clue(removed.pop(clue))
+            self.assertSameAsFresh(session, variables, domains)
+
+    def testRemoveUndoesPruning(self):
+        variables = ["a", "b"]
+        domains = {"a": [1, 2, 3], "b": [1, 2, 3]}
+        at_one = (lambda a: a == 1, ["a"], 1)
+        left_of = (lambda a, b: a < b, ["a", "b"], 2)
+        session = SolverSession(variables, domains, [at_one, left_of])
+        self.assertEqual(session.domains, {"a": [1], "b": [2, 3]})
+
+        session.remove(at_one)
+        self.assertEqual(session.domains, {"a": [1, 2], "b": [2, 3]})
+        session.remove(left_of)
+        self.assertEqual(session.domains, domains)
+        self.assertEqual(session.count_solutions(limit=100), 9)
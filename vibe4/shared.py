@@ -0,0 +1,13 @@
+# vibe4 reuses the dataset tooling that lives in ../src. The directory is
+# appended rather than prepended so vibe4's own parser.py / solver.py keep
+# precedence over the src modules of the same name.
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+if SRC_DIR not in sys.path:
+    sys.path.append(SRC_DIR)
+
+from source import PuzzleSource  # noqa: E402
+from results import ResultWriter  # noqa: E402
+from logs import configure as configure_logs, get_logger  # noqa: E402
@@ -1,15 +1,98 @@
 import copy
+import os
+import time
+import unittest
+from collections import OrderedDict
+from deduction import DeductionTrace, ASSIGN, PRUNE, CONFLICT, WIPEOUT, NOGOOD, IMPLICIT_CLUE
+
+# solver.status after solve()
+SOLVED = "solved"
+FAILED = "failed"
+TIMEOUT = "timeout"  # budget ran out, solve() returned the best partial grid
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised inside the search when the node or time budget runs out.
+    """
+
+
+class NogoodStore:
+    """
+    Bounded set of learned dead ends with LRU eviction. A nogood is a
+    frozenset of (variable, house) pairs that cannot all hold in a solution.
+    Nogoods are indexed by their pairs, so a lookup only looks at the ones
+    containing the pair about to be assigned.
+    """
+
+    def __init__(self, limit=10000):
+        self.limit = limit
+        self.hits = 0
+        self._lru = OrderedDict()
+        self._by_pair = {}
+
+    def __len__(self):
+        return len(self._lru)
+
+    def add(self, nogood):
+        # An empty nogood would mean the puzzle has no solution at all
+        if not nogood or self.limit <= 0:
+            return
+        if nogood in self._lru:
+            self._lru.move_to_end(nogood)
+            return
+
+        self._lru[nogood] = None
+        for pair in nogood:
+            self._by_pair.setdefault(pair, set()).add(nogood)
+
+        if len(self._lru) > self.limit:
+            old, _ = self._lru.popitem(last=False)
+            for pair in old:
+                bucket = self._by_pair[pair]
+                bucket.discard(old)
+                if not bucket:
+                    del self._by_pair[pair]
+
+    def find(self, assignment, var, value):
+        """
+        Returns a nogood that var = value would complete, or None.
+        """
+        for nogood in self._by_pair.get((var, value), ()):
+            if all(v == var or assignment.get(v) == h for v, h in nogood):
+                self._lru.move_to_end(nogood)
+                self.hits += 1
+                return nogood
+        return None
+
 
 class CSPSolver:
-    def __init__(self, variables, domains):
+    def __init__(self, variables, domains, max_nodes=None, time_limit=None, nogood_limit=10000):
         self.variables = variables
         self.domains = domains
         self.constraints = []
         self.steps = 0
-        self.trace = []  # Required for competition
+        self.trace = DeductionTrace()  # Required for competition
+        self.var_index = {v: i for i, v in enumerate(variables)}
+
+        # Per-puzzle budgets (None = unlimited) and anytime fallback
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.status = SOLVED
+        self.partial = {}
+        self._deadline = None
+
+        # Dead ends learned by search(); they stay valid as long as no
+        # constraint is removed, so they are kept across solve() calls
+        self.nogoods = NogoodStore(nogood_limit)
+        self.conflict_scope = ()  # scope of the constraint is_consistent() rejected
+        self.wiped = None         # variable whose domain forward_check() emptied
 
-    def add_constraint(self, func, scope):
-        self.constraints.append((func, scope))
+    def add_constraint(self, func, scope, clue=IMPLICIT_CLUE):
+        """
+        clue: number of the clue in the puzzle text, used by the deduction trace.
+        """
+        self.constraints.append((func, scope, clue))
 
     def is_consistent(self, assignment, var, value):
         """
@@ -19,11 +102,13 @@ class CSPSolver:
         temp_assignment = assignment.copy()
         temp_assignment[var] = value
 
-        for func, scope in self.constraints:
+        for func, scope, clue in self.constraints:
             # Only check constraints where all variables are assigned/present
             if all(v in temp_assignment for v in scope):
                 args = [temp_assignment[v] for v in scope]
                 if not func(*args):
+                    self.trace.record(CONFLICT, clue, self.var_index[var], value)
+                    self.conflict_scope = scope
                     return False
         return True
 
@@ -36,7 +121,7 @@ class CSPSolver:
         new_domains[var] = [value] # Collapsed to single value
 
         # Iterate over constraints involving this variable
-        for func, scope in self.constraints:
+        for func, scope, clue in self.constraints:
             if var in scope:
                 # Find the other variable in the constraint (assuming binary constraints mostly)
                 others = [v for v in scope if v != var]
@@ -57,11 +142,15 @@ class CSPSolver:
                         args = [args_map[s] for s in scope]
                         if func(*args):
                             valid_options.append(other_val)
+                        else:
+                            self.trace.record(PRUNE, clue, self.var_index[other], other_val)
                     except:
                         # Fallback if scope logic is complex
                         valid_options.append(other_val)
                 
                 if not valid_options:
+                    self.trace.record(WIPEOUT, clue, self.var_index[other], 0)
+                    self.wiped = other
                     return None # Domain wipeout! Backtrack.
                 new_domains[other] = valid_options
         
@@ -77,44 +166,226 @@ class CSPSolver:
         return min(unassigned, key=lambda v: len(current_domains[v]))
 
     def solve(self):
+        """
+        Returns the solution, None if there is none, or - when a budget runs
+        out - the partial assignment with the most fixed variables (see status).
+        """
+        self.steps = 0
+        self.trace = DeductionTrace()
+        self._start_budget()
+        try:
+            # Initial Forward Check (Arc Consistency on unary constraints)
+            result = self.backtrack({}, self.domains)
+        except BudgetExceeded:
+            self.status = TIMEOUT
+            return dict(self.partial)
+
+        self.status = SOLVED if result else FAILED
+        return result
+
+    def count_solutions(self, limit=2):
+        """
+        Counts solutions, stopping as soon as `limit` have been found.
+        With the default limit=2 this tells unique puzzles from ambiguous ones
+        without enumerating the whole search space.
+        """
         self.steps = 0
-        self.trace = []
-        # Initial Forward Check (Arc Consistency on unary constraints)
-        return self.backtrack({}, self.domains)
+        self.trace = DeductionTrace()
+        self._start_budget()
+        self.status = SOLVED
+        count = 0
+        try:
+            for _ in self.search({}, self.domains):
+                count += 1
+                if count >= limit:
+                    break
+        except BudgetExceeded:
+            self.status = TIMEOUT
+        return count
+
+    def uniqueness(self):
+        """
+        Returns "unique", "multiple" or "none" for the current constraint set,
+        or "timeout" if the budget ran out before the answer was certain.
+        """
+        count = self.count_solutions(limit=2)
+        if self.status == TIMEOUT:
+            return TIMEOUT
+        return UNIQUENESS[count]
+
+    def _start_budget(self):
+        self._deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        self.partial = {}
+
+    def _remember_partial(self, current_domains):
+        """
+        Keeps the domains state with the most variables fixed to one house.
+        """
+        fixed = {v: d[0] for v, d in current_domains.items() if len(d) == 1}
+        if len(fixed) > len(self.partial):
+            self.partial = fixed
+
+    def explain(self, clues=None):
+        """
+        Human-readable deduction trace of the last solve.
+        clues: {clue number: text} as collected by PuzzleParser.
+        """
+        return self.trace.explain(self.variables, clues)
 
     def backtrack(self, assignment, current_domains):
+        for solution in self.search(assignment, current_domains):
+            return solution
+        return None
+
+    def search(self, assignment, current_domains, culprits=None):
+        """
+        Yields `assignment` each time it is complete and consistent.
+        Stopping the iteration leaves the last solution in place.
+
+        Conflict-directed backjumping: the generator returns the conflict set
+        of its subtree (the assigned variables that made it fail) or None if
+        it yielded a solution. A variable that is not in its child's conflict
+        set cannot repair the failure, so its other values are skipped.
+        culprits: variable -> assigned variables that pruned its domain
+        """
         # 1. Solution Found
         if len(assignment) == len(self.variables):
-            return assignment
+            yield assignment
+            return None
+
+        self._remember_partial(current_domains)
+        culprits = culprits or {}
 
         # 2. Select Variable (MRV)
         var = self.mrv_heuristic(assignment, current_domains)
 
+        # Whoever pruned var's domain shares the blame for any failure here
+        conflict = set(culprits.get(var, ()))
+        found = False
+
         # 3. Try Values
         # Optimally, we would sort these by LCV (Least Constraining Value), 
         # but purely iterating is often fast enough for Zebra puzzles.
         for value in current_domains[var]:
             self.steps += 1
+            if self.max_nodes is not None and self.steps > self.max_nodes:
+                raise BudgetExceeded()
+            if self._deadline is not None and time.perf_counter() > self._deadline:
+                raise BudgetExceeded()
             
-            # Log for Trace Requirement
-            self.trace.append({
-                "step": self.steps,
-                "variable": var,
-                "value": value,
-                "domain_size": len(current_domains[var])
-            })
+            # Log for Trace Requirement (rendered with self.explain())
+            self.trace.record(ASSIGN, IMPLICIT_CLUE, self.var_index[var], value)
+
+            # Dead end seen before under another prefix
+            nogood = self.nogoods.find(assignment, var, value)
+            if nogood is not None:
+                self.trace.record(NOGOOD, IMPLICIT_CLUE, self.var_index[var], value)
+                conflict.update(v for v, _ in nogood if v != var)
+                continue
 
             # Check Consistency
-            if self.is_consistent(assignment, var, value):
-                
-                # Forward Checking (Lookahead)
-                new_domains = self.forward_check(assignment, var, value, current_domains)
-                
-                if new_domains is not None:
-                    assignment[var] = value
-                    result = self.backtrack(assignment, new_domains)
-                    if result:
-                        return result
-                    del assignment[var] # Backtrack
-        
-        return None
\ No newline at end of file
+            if not self.is_consistent(assignment, var, value):
+                conflict.update(v for v in self.conflict_scope if v != var)
+                continue
+
+            # Forward Checking (Lookahead)
+            new_domains = self.forward_check(assignment, var, value, current_domains)
+            if new_domains is None:
+                conflict.update(culprits.get(self.wiped, ()))
+                continue
+
+            new_culprits = dict(culprits)
+            for other, domain in new_domains.items():
+                if other != var and len(domain) < len(current_domains[other]):
+                    new_culprits[other] = new_culprits.get(other, frozenset()) | {var}
+
+            assignment[var] = value
+            child = yield from self.search(assignment, new_domains, new_culprits)
+            del assignment[var] # Backtrack
+
+            if child is None:
+                found = True
+            elif var not in child and not found:
+                # Backjump over var
+                return child
+            else:
+                conflict.update(child - {var})
+
+        if found:
+            return None
+
+        # No house works for var while the conflict variables keep their houses
+        self.nogoods.add(frozenset((v, assignment[v]) for v in conflict))
+        return conflict
+
+
+# count_solutions(limit=2) -> report label
+UNIQUENESS = {0: "none", 1: "unique", 2: "multiple"}
+
+
+class SolverTest(unittest.TestCase):
+    def _brute_force(self, variables, domains, constraints, groups):
+        """
+        Every solution, by trying each group as a permutation of houses.
+        """
+        from itertools import permutations, product
+
+        houses = sorted({h for d in domains.values() for h in d})
+        solutions = []
+        for choice in product(*(permutations(houses, len(group)) for group in groups)):
+            assignment = {v: h for group, hs in zip(groups, choice) for v, h in zip(group, hs)}
+            if all(assignment[v] in domains[v] for v in variables) and \
+                    all(func(*[assignment[v] for v in scope]) for func, scope, _ in constraints):
+                solutions.append(assignment)
+        return solutions
+
+    def testBackjumpingMatchesBruteForce(self):
+        from math import factorial
+        from parser import PuzzleParser
+        from shared import PuzzleSource
+
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "zebra_puzzles.json")
+        checked = 0
+        for raw in PuzzleSource(path, limit=200):
+            parser = PuzzleParser.from_raw(raw)
+            variables, domains, constraints, groups = parser.parse()
+            n = parser.num_houses
+            space = 1
+            for group in groups:
+                space *= factorial(n) // factorial(n - len(group))
+            if space > 2000 or len(set(variables)) < len(variables):
+                continue
+
+            expected = self._brute_force(variables, domains, constraints, groups)
+            for nogood_limit in (10000, 0):
+                solver = CSPSolver(variables, domains, nogood_limit=nogood_limit)
+                for func, scope, clue in constraints:
+                    solver.add_constraint(func, scope, clue)
+                self.assertEqual(solver.count_solutions(limit=10 ** 6), len(expected), raw.ID)
+                solution = solver.solve()
+                if expected:
+                    self.assertIn(dict(solution), expected, raw.ID)
+                else:
+                    self.assertIsNone(solution, raw.ID)
+            checked += 1
+        self.assertGreaterEqual(checked, 10)
+
+    def testNogoodStoreEvictsLeastRecentlyUsed(self):
+        store = NogoodStore(limit=2)
+        a, b, c = frozenset({("x", 1), ("y", 2)}), frozenset({("x", 2), ("z", 1)}), frozenset({("y", 1), ("z", 2)})
+        store.add(a)
+        store.add(b)
+        self.assertEqual(store.find({"y": 2}, "x", 1), a)  # a is now the most recent
+        store.add(c)
+
+        self.assertEqual(len(store), 2)
+        self.assertIsNone(store.find({"z": 1}, "x", 2))  # b was evicted
+        self.assertEqual(store.find({"y": 1}, "z", 2), c)
+        self.assertNotIn(("x", 2), store._by_pair)
+        self.assertEqual(store.hits, 2)
+
+        store.add(frozenset())
+        self.assertEqual(len(store), 2)
+        disabled = NogoodStore(limit=0)
+        disabled.add(a)
+        self.assertEqual(len(disabled), 0)